@@ -0,0 +1,108 @@
+from threading import Lock
+from time import time
+import sqlite3
+
+
+class ActivityLedger:
+
+    def __init__(self, path):
+        """Local record of each character's most recent known killmail time
+
+        ``last_kill`` is the newest killmail time seen for the character (unix
+        timestamp, or NULL if zKB reported none); ``checked`` is when that was
+        last confirmed against zKB.
+
+        Args:
+            path (str): path to the local sqlite file
+        """
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS activity ('
+            'character_id INTEGER PRIMARY KEY, last_kill REAL, checked REAL NOT NULL)'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS feed_state (id INTEGER PRIMARY KEY CHECK (id = 0), started REAL NOT NULL, last_seen REAL NOT NULL)'
+        )
+        self.connection.commit()
+
+    def last_kill(self, character_ids):
+        """Gets the newest known kill across a set of characters
+
+        Args:
+            character_ids (list): character ids
+
+        Returns:
+            float: unix timestamp of the newest kill, or None if none are known
+        """
+        if not character_ids:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT MAX(last_kill) FROM activity WHERE character_id IN ({})'.format(','.join('?' * len(character_ids))),
+                [int(e) for e in character_ids]
+            ).fetchone()
+        return row[0]
+
+    def get(self, character_id, max_age):
+        """Gets a single character's entry if it was checked recently enough
+
+        Args:
+            character_id (int): character id
+            max_age (int): maximum seconds since the entry was confirmed
+
+        Returns:
+            tuple: (found, last_kill) - found is False if there is no fresh entry
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT last_kill, checked FROM activity WHERE character_id = ?', (int(character_id), )
+            ).fetchone()
+        if not row or row[1] < time() - max_age:
+            return False, None
+        return True, row[0]
+
+    def feed_state(self):
+        """Gets the kill feed's coverage window
+
+        Returns:
+            tuple: (started, last_seen) unix timestamps, or None if the feed has never run
+        """
+        with self.lock:
+            return self.connection.execute('SELECT started, last_seen FROM feed_state WHERE id = 0').fetchone()
+
+    def set_feed_state(self, started, last_seen):
+        """Stores the kill feed's coverage window
+
+        Args:
+            started (float): when the current unbroken stretch of polling began
+            last_seen (float): when the feed was last polled successfully
+        """
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO feed_state (id, started, last_seen) VALUES (0, ?, ?)', (started, last_seen)
+            )
+            self.connection.commit()
+
+    def record(self, character_ids, kill_time):
+        """Records a confirmed latest kill time for characters
+
+        Never moves ``last_kill`` backwards.
+
+        Args:
+            character_ids (list): character ids
+            kill_time (float): unix timestamp of the kill, or None for no kills
+        """
+        now = time()
+        with self.lock:
+            # INSERT OR IGNORE + UPDATE rather than an upsert, which needs SQLite 3.24
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO activity (character_id, last_kill, checked) VALUES (?, ?, ?)',
+                [(int(e), kill_time, now) for e in character_ids]
+            )
+            self.connection.executemany(
+                'UPDATE activity SET last_kill = MAX(COALESCE(last_kill, ?1), COALESCE(?1, last_kill)), checked = ?2 '
+                'WHERE character_id = ?3',
+                [(kill_time, now, int(e)) for e in character_ids]
+            )
+            self.connection.commit()
@@ -0,0 +1,120 @@
+from http.server import BaseHTTPRequestHandler
+from threading import Lock, Thread
+from time import time
+import json
+import sqlite3
+
+from metrics import ThreadingHTTPServer
+
+
+class AppTracker:
+
+    def __init__(self, path):
+        """Remembers the last getin-auth apps response and which applications were announced
+
+        The response body is kept with its ``ETag`` and ``Last-Modified``
+        validators so the next poll can be a conditional request.
+
+        Args:
+            path (str): path to the local sqlite file
+        """
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS announced_apps (name TEXT PRIMARY KEY, announced REAL NOT NULL)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS apps_state (id INTEGER PRIMARY KEY CHECK (id = 0), etag TEXT, last_modified TEXT, body TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+    def cached(self):
+        """Gets the last stored apps response
+
+        Returns:
+            tuple: (etag, last_modified, applications), or None if nothing is stored
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT etag, last_modified, body FROM apps_state WHERE id = 0').fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def store(self, etag, last_modified, applications):
+        """Stores an apps response
+
+        Args:
+            etag (str): response ETag, if any
+            last_modified (str): response Last-Modified, if any
+            applications (list): application names
+        """
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO apps_state (id, etag, last_modified, body) VALUES (0, ?, ?, ?)',
+                (etag, last_modified, json.dumps(applications))
+            )
+            self.connection.commit()
+
+    def announce(self, applications):
+        """Marks pending applications as announced
+
+        Names that are no longer pending are forgotten, so someone who
+        applies again later is announced again.
+
+        Args:
+            applications (list): every currently pending application name
+
+        Returns:
+            list: the names that had not been announced before, in the order given
+        """
+        with self.lock:
+            announced = {row[0] for row in self.connection.execute('SELECT name FROM announced_apps')}
+            new = [name for name in applications if name not in announced]
+            self.connection.executemany(
+                'DELETE FROM announced_apps WHERE name = ?', [(name, ) for name in announced - set(applications)]
+            )
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO announced_apps (name, announced) VALUES (?, ?)', [(name, time()) for name in new]
+            )
+            self.connection.commit()
+        return new
+
+
+class AppPushReceiver(Thread):
+
+    def __init__(self, host, port, secret, callback):
+        """Lets getin-auth notify the bot of a new application instead of waiting for the next poll
+
+        getin-auth POSTs to /apps with the same ``REST-SECRET`` header the
+        bot sends it; the callback then triggers an immediate apps check.
+
+        Args:
+            host (str): address to bind, normally 127.0.0.1
+            port (int): port to bind
+            secret (str): expected REST-SECRET header value
+            callback (callable): called with no arguments on each valid push
+        """
+        super().__init__(name='Thread-apps-push', daemon=True)
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                if self.path != '/apps':
+                    self.send_error(404)
+                    return
+                if self.headers.get('REST-SECRET') != secret:
+                    self.send_error(403)
+                    return
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                callback()
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Offline benchmark for the killboard sweep, !query and !subscribe
+
+Starts local stand-ins for ESI, zKillboard and getin-auth, builds a
+synthetic getin-auth database per roster size and times the real Util
+code paths against them. Results are written as JSON lines.
+
+    $ python benchmark.py --sizes 100,1000 --latency 0.02 --error-rate 0.01
+"""
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler
+from threading import Lock, Thread
+from time import monotonic, sleep, time
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+
+from metrics import ThreadingHTTPServer
+from util import ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID, Util
+
+
+MAIN_ID_BASE = 90000000
+ALT_ID_BASE = 95000000
+KNOW_COLUMNS = [
+    'know_good_fits', 'know_scan', 'know_mass_and_time', 'know_organize_gank', 'know_when_to_pve', 'know_comms',
+    'know_appropriate_ships', 'know_intel', 'know_pvp', 'know_doctrine'
+]
+
+
+class StandIn:
+
+    def __init__(self, latency, error_rate):
+        """Local stand-in for the ESI, zKB, getin-auth and Discord role endpoints the bot uses
+
+        Which mains are inactive, recent joiners or out of corp is derived
+        from the character ID, so every run sees the same data.
+
+        Args:
+            latency (float): seconds added to every response
+            error_rate (float): fraction of requests answered with a 503
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = Lock()
+        self.requests = {}
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, kind):
+                with stand_in.lock:
+                    stand_in.requests[kind] = stand_in.requests.get(kind, 0) + 1
+                sleep(stand_in.latency)
+                if random.random() < stand_in.error_rate:
+                    status, body = 503, {'error': 'stand-in failure'}
+                else:
+                    status, body = 200, stand_in.respond(kind, self)
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if kind == 'esi_corporationhistory' and status == 200:
+                    self.send_header('ETag', '"{}"'.format(hash(data)))
+                    self.send_header('Expires', formatdate(time() + 3600, usegmt=True))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if '/corporationhistory/' in self.path:
+                    self._reply('esi_corporationhistory')
+                elif '/characterID/' in self.path:
+                    self._reply('zkb_characterid')
+                elif self.path.startswith('/apps'):
+                    self._reply('auth_apps')
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if '/affiliation/' in self.path:
+                    self._reply('esi_affiliation')
+                else:
+                    self.send_error(404)
+
+            def _role_change(self):
+                if '/roles/' not in self.path:
+                    self.send_error(404)
+                    return
+                with stand_in.lock:
+                    stand_in.requests['discord_member_role'] = stand_in.requests.get('discord_member_role', 0) + 1
+                sleep(stand_in.latency)
+                self.send_response(204)
+                self.end_headers()
+
+            do_PUT = _role_change
+            do_DELETE = _role_change
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def respond(kind, handler):
+        now = datetime.utcnow()
+        if kind == 'esi_corporationhistory':
+            character_id = int(re.search(r'characters/(\d+)/', handler.path).group(1))
+            joined = now - timedelta(days=5 if character_id % 11 == 0 else 400)
+            return [{'corporation_id': WORMBRO_CORP_ID, 'start_date': joined.strftime('%Y-%m-%dT%H:%M:%SZ'), 'record_id': 1}]
+        if kind == 'esi_affiliation':
+            ids = json.loads(handler.rfile.read(int(handler.headers['Content-Length'])))
+            return [{'character_id': e, 'corporation_id': 1 if e % 13 == 0 else WORMBRO_CORP_ID} for e in ids]
+        if kind == 'zkb_characterid':
+            ids = [int(e) for e in re.search(r'characterID/([\d,]+)/', handler.path).group(1).split(',')]
+            if ids[0] % 4 == 0:
+                return []
+            return [{
+                'killmail_time': (now - timedelta(days=ids[0] % 20)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'attackers': [{'character_id': ids[-1]}],
+                'victim': {'character_id': 1}
+            }]
+        return ['Applicant {}'.format(e) for e in range(3)]
+
+    def reset(self):
+        with self.lock:
+            counts = self.requests
+            self.requests = {}
+        return counts
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def build_database(path, mains, alts):
+    """Writes a synthetic getin-auth member table
+
+    Args:
+        path (str): database file to create
+        mains (int): number of accepted mains
+        alts (int): alts per main
+    """
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE member (id INTEGER PRIMARY KEY, character_id TEXT, character_name TEXT, main TEXT, status TEXT, '
+        'corporation TEXT, reddit TEXT, {})'.format(', '.join(e + ' INTEGER' for e in KNOW_COLUMNS))
+    )
+    rows = []
+    for i in range(mains):
+        main = 'Main {:05d}'.format(i)
+        know = [random.randint(0, 1) for _ in KNOW_COLUMNS]
+        rows.append([str(MAIN_ID_BASE + i), main, main, 'Accepted', 'Wormbro', 'redditor{}'.format(i)] + know)
+        for j in range(alts):
+            rows.append([str(ALT_ID_BASE + i * alts + j), 'Alt {:05d}-{}'.format(i, j), main, 'Accepted', 'Wormbro', 'redditor{}'.format(i)] + know)
+    for i in range(mains // 10):
+        rows.append([None, 'Applicant {:05d}'.format(i), 'Applicant {:05d}'.format(i), 'New', 'Other', None] + [0] * len(KNOW_COLUMNS))
+    connection.executemany(
+        'INSERT INTO member (character_id, character_name, main, status, corporation, reddit, {}) VALUES ({})'.format(
+            ', '.join(KNOW_COLUMNS), ', '.join('?' * (6 + len(KNOW_COLUMNS)))
+        ),
+        rows
+    )
+    connection.commit()
+    connection.close()
+
+
+class StubBot:
+    """Bot stand-in whose guild cache is filled up front, so only role changes reach the stand-in"""
+
+    def __init__(self):
+        self._listeners = {}
+
+    def on(self, event):
+        def inner(f):
+            self._listeners.setdefault(event, []).append(f)
+            return f
+        return inner
+
+    def dispatch(self, event, data):
+        for listener in self._listeners.get(event, []):
+            listener(data)
+
+    def _build_headers(self):
+        return {}
+
+
+def timed(f, *args):
+    start = monotonic()
+    f(*args)
+    return monotonic() - start
+
+
+def run(size, args, stand_in, logger):
+    """Benchmarks every code path at one roster size
+
+    Args:
+        size (int): number of mains
+        args (argparse.Namespace): command line arguments
+        stand_in (StandIn): running stand-in server
+        logger (logging.Logger): logger handed to Util
+
+    Returns:
+        list: result records
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        auth_path = os.path.join(workdir, 'data.db')
+        build_database(auth_path, size, args.alts)
+        config = {
+            'URL_ROOT': stand_in.url + '/',
+            'API_SECRET': 'benchmark',
+            'ZKILL_USER_AGENT': 'benchmark',
+            'AUTH_DATABASE': auth_path,
+            'LOCAL_DATABASE': os.path.join(workdir, 'local.db'),
+            'PRIVATE_COMMAND_CHANNELS': {'RECRUITMENT': '1', 'ACTIVITY': '2', 'ACTIVITY_MODERATION': '3'},
+            'SUBSCRIBE_ROLES': [
+                {'NAME': 'Role {}'.format(i), 'TYPE': 'benchmark', 'DESCRIPTION': 'benchmark role'} for i in range(20)
+            ],
+            'HTTP': {
+                'BACKOFF': 0.01,
+                'HOST_OVERRIDES': {'esi.tech.ccp.is': stand_in.url, 'zkillboard.com': stand_in.url, 'discordapp.com': stand_in.url}
+            },
+            'SWEEP': {
+                'WORKERS': args.workers,
+                'ESI': {'CONCURRENCY': args.workers, 'RATE': args.rate, 'BURST': args.rate},
+                'ZKB': {'CONCURRENCY': args.workers, 'RATE': args.rate, 'BURST': args.rate}
+            }
+        }
+        bot = StubBot()
+        util = Util(bot, config, logger, ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID)
+        bot.dispatch('GUILD_CREATE', {
+            'id': 'guild',
+            'roles': [{'id': str(i), 'name': 'Role {}'.format(i)} for i in range(40)],
+            'members': [{'user': {'id': 'member'}, 'roles': [str(i) for i in range(0, 40, 2)]}]
+        })
+
+        def record(name, seconds, **extra):
+            entry = dict(benchmark=name, mains=size, alts=args.alts, latency=args.latency, error_rate=args.error_rate,
+                         seconds=round(seconds, 4), requests=stand_in.reset(), **extra)
+            results.append(entry)
+            print(json.dumps(entry), flush=True)
+
+        stand_in.reset()
+        for label in ('cold', 'warm'):
+            record('check_killboard', timed(util.check_killboard), cache=label)
+
+        names = ['main {:05d}'.format(random.randrange(size)) for _ in range(args.queries)]
+        for label in ('cold', 'warm'):
+            seconds = timed(lambda: [util.query({'d': {'content': '!query char|' + e}}) for e in names])
+            record('query_char', seconds / len(names), cache=label, per='call')
+        seconds = timed(lambda: [util.query({'d': {'content': '!query reddit|REDDITOR{}'.format(random.randrange(size))}}) for _ in names])
+        record('query_reddit', seconds / len(names), per='call')
+
+        def subscription(content):
+            return {'d': {'content': content, 'guild_id': 'guild', 'author': {'id': 'member'}}}
+        start = monotonic()
+        for i in range(args.queries):
+            util.subscribe(subscription('!subscribe'))
+            util.subscribe(subscription('!subscribe role {}'.format(i % 20)))
+            util.unsubscribe(subscription('!unsubscribe role {}'.format(i % 20)))
+        record('subscription', (monotonic() - start) / (args.queries * 3), per='call')
+    return results
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='100,1000,10000', help='comma separated roster sizes (mains)')
+    parser.add_argument('--alts', type=int, default=2, help='alts per main')
+    parser.add_argument('--latency', type=float, default=0.01, help='stand-in response latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of stand-in requests that fail with a 503')
+    parser.add_argument('--workers', type=int, default=16, help='sweep workers and per-host concurrency')
+    parser.add_argument('--rate', type=float, default=1000, help='per-host requests per second')
+    parser.add_argument('--queries', type=int, default=50, help='!query and !subscribe calls per size')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logger = logging.getLogger('getin-auth-discord-benchmark')
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+    logger.setLevel(logging.ERROR)
+    stand_in = StandIn(args.latency, args.error_rate)
+    results = []
+    try:
+        for size in [int(e) for e in args.sizes.split(',')]:
+            results.extend(run(size, args, stand_in, logger))
+    finally:
+        stand_in.stop()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
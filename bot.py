@@ -1,47 +1,46 @@
 #!/usr/bin/env python3
-import json
 import logging
-import sys
 import time
-
-from pycord import Pycord
-
-from util import Util
+from concurrent.futures import wait
+
+from executor import CommandExecutor
+from gateway import GatewayBot
+from logs import configure_logging
+from apps import AppPushReceiver
+from metrics import REGISTRY, MetricsServer
+from util import ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID, Util
 from scheduler import Scheduler
+from settings import ConfigManager
+from redisq import KillFeed
 
 
 __version__ = '2.0.6'
+STARTED = time.monotonic()
 
-with open('config.json') as f:
-    config = json.load(f)
+logger = logging.getLogger('getin-auth-discord')
+settings = ConfigManager('config.json', logger)
+config = settings.current
 
 
 NEW_APPS_SLEEP_TIME = 900  # 15 minutes
 KILLBOARD_SLEEP_TIME = 86400  # 1 day
-ACTIVITY_TIME_DAYS = 30  # (roughly) 1 month
-WORMBRO_CORP_ID = 98134538
 WRONG_CHANNEL_MESSAGE = 'This command cannot be used from this channel'
+PREWARM_TIMEOUT = 60
+GATEWAY_SHARD = config.get('GATEWAY', {}).get('SHARD')
+# with several gateway shards only the first runs scheduled jobs, so sweeps and reports happen once
+RUNS_SCHEDULER = not GATEWAY_SHARD or GATEWAY_SHARD[0] == 0
 
-logger = logging.getLogger('getin-auth-discord')
-logger.setLevel(config['LOGGING']['LEVEL']['ALL'])
-formatter = logging.Formatter(style='{', fmt='{asctime} [{levelname}] {message}', datefmt='%Y-%m-%d %H:%M:%S')
-handler = logging.StreamHandler(sys.stdout)
-handler.setFormatter(formatter)
-handler.setLevel(config['LOGGING']['LEVEL']['CONSOLE'])
-logger.addHandler(handler)
-handler = logging.FileHandler(config['LOGGING']['FILE'])
-handler.setFormatter(formatter)
-handler.setLevel(config['LOGGING']['LEVEL']['FILE'])
-logger.addHandler(handler)
-
-bot = Pycord(
+log_listener = configure_logging(logger, config['LOGGING'])
+
+bot = GatewayBot(
     config['TOKEN'],
     user_agent='GETIN-Auth-Discord (github.com/Celeo/GETIN-Auth-Discord, {__version__})',
-    logging_level=config['LOGGING']['LEVEL']['PYCORD']
+    logging_level=config['LOGGING']['LEVEL']['PYCORD'],
+    shard=GATEWAY_SHARD
 )
 util = Util(
     bot,
-    config,
+    settings,
     logger,
     ACTIVITY_TIME_DAYS,
     WORMBRO_CORP_ID
@@ -51,107 +50,87 @@ scheduler = Scheduler(
     NEW_APPS_SLEEP_TIME,
     KILLBOARD_SLEEP_TIME
 )
+executor = CommandExecutor(bot, util.messages, logger, config.get('COMMANDS'))
+
 
+def guild_config(data):
+    return util.guild_config(data['d'].get('guild_id'))
 
-@bot.command('source')
+
+@executor.command('source', inline=True)
 def command_source(data):
-    bot.send_message(
-        data['d']['channel_id'],
-        'https://github.com/EVE-GETIN/GETIN-Auth-Discord by Celeo (EVE: Celeo Servasse) and WizBoom (EVE: Alex Kommorov)'
-    )
+    return 'https://github.com/EVE-GETIN/GETIN-Auth-Discord by Celeo (EVE: Celeo Servasse) and WizBoom (EVE: Alex Kommorov)'
 
 
-@bot.command('schedule')
+@executor.command('schedule', inline=True)
 def command_schedule(data):
-    message = f'''Schedule:
+    return f'''Schedule:
 #
 Check for new applications every {NEW_APPS_SLEEP_TIME // 60} minutes
 Check for killboard activity every {KILLBOARD_SLEEP_TIME // 3600} hours
+```{scheduler.describe()}```
 '''
-    bot.send_message(data['d']['channel_id'], message)
 
 
-@bot.command('apps')
+@executor.command('apps')
 def command_apps(data):
-    c = data['d']['channel_id']
-    if not c == config['PRIVATE_COMMAND_CHANNELS']['RECRUITMENT']:
-        bot.send_message(c, WRONG_CHANNEL_MESSAGE)
-        return
-    try:
-        bot.send_message(c, util.check_apps())
-    except Exception as e:
-        logger.error('Exception in !check_apps: ' + str(e))
-        bot.send_message(c, 'An error occurred in the processing of that command')
-
-
-@bot.command('subscribe')
+    if not data['d']['channel_id'] == guild_config(data)['PRIVATE_COMMAND_CHANNELS']['RECRUITMENT']:
+        return WRONG_CHANNEL_MESSAGE
+    return util.check_apps()
+
+
+@executor.command('subscribe')
 def command_subscribe(data):
-    try:
-        message_channel = data['d']['channel_id']
-        if message_channel in config['SUBSCRIBE_WHITELISTED_CHANNELS']:
-            bot.send_message(message_channel, util.subscribe(data))
-        else:
-            bot.send_message(message_channel, WRONG_CHANNEL_MESSAGE)
-    except Exception as e:
-        logger.error('Exception in !subscribe: ' + str(e))
-        bot.send_message(message_channel, 'An error occurred in the processing of that command')
-
-
-@bot.command('unsubscribe')
+    if data['d']['channel_id'] in guild_config(data)['SUBSCRIBE_WHITELISTED_CHANNELS']:
+        return util.subscribe(data)
+    return WRONG_CHANNEL_MESSAGE
+
+
+@executor.command('unsubscribe')
 def command_unsubscribe(data):
-    try:
-        message_channel = data['d']['channel_id']
-        if message_channel in config['SUBSCRIBE_WHITELISTED_CHANNELS']:
-            bot.send_message(message_channel, util.unsubscribe(data))
-        else:
-            bot.send_message(message_channel, WRONG_CHANNEL_MESSAGE)
-    except Exception as e:
-        logger.error('Exception in !unsubscribe: ' + str(e))
-        bot.send_message(message_channel, 'An error occurred in the processing of that command')
-
-
-@bot.command('whitelist')
+    if data['d']['channel_id'] in guild_config(data)['SUBSCRIBE_WHITELISTED_CHANNELS']:
+        return util.unsubscribe(data)
+    return WRONG_CHANNEL_MESSAGE
+
+
+@executor.command('whitelist')
 def command_whitelist(data):
-    try:
-        message_channel = data['d']['channel_id']
-        if message_channel in config['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
-            bot.send_message(message_channel, util.whitelist(data))
-        else:
-            bot.send_message(message_channel, WRONG_CHANNEL_MESSAGE)
-    except Exception as e:
-        logger.error('Exception in !whitelist: ' + str(e))
-        bot.send_message(message_channel, 'An error occurred in the processing of that command')
-
-
-@bot.command('unwhitelist')
+    if data['d']['channel_id'] in guild_config(data)['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
+        return util.whitelist(data)
+    return WRONG_CHANNEL_MESSAGE
+
+
+@executor.command('unwhitelist')
 def command_unwhitelist(data):
-    try:
-        message_channel = data['d']['channel_id']
-        if message_channel in config['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
-            bot.send_message(message_channel, util.unwhitelist(data))
-        else:
-            bot.send_message(message_channel, WRONG_CHANNEL_MESSAGE)
-    except Exception as e:
-        logger.error('Exception in !unwhitelist: ' + str(e))
-        bot.send_message(message_channel, 'An error occurred in the processing of that command')
-
-
-@bot.command('query')
+    if data['d']['channel_id'] in guild_config(data)['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
+        return util.unwhitelist(data)
+    return WRONG_CHANNEL_MESSAGE
+
+
+@executor.command('query', timeout=90)
 def command_query(data):
-    try:
-        message_channel = data['d']['channel_id']
-        if message_channel in config['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
-            bot.send_message(message_channel, util.query(data))
-        else:
-            bot.send_message(message_channel, WRONG_CHANNEL_MESSAGE)
-    except Exception as e:
-        logger.error('Exception in !query: ' + str(e))
-        bot.send_message(message_channel, 'An error occurred in the processing of that command')
-
-
-@bot.command('help')
+    if data['d']['channel_id'] in guild_config(data)['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
+        return util.query(data)
+    return WRONG_CHANNEL_MESSAGE
+
+
+@executor.command('activity')
+def command_activity(data):
+    if data['d']['channel_id'] in guild_config(data)['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
+        return util.activity_query(data)
+    return WRONG_CHANNEL_MESSAGE
+
+
+@executor.command('stats', inline=True)
+def command_stats(data):
+    if data['d']['channel_id'] in guild_config(data)['PRIVATE_COMMAND_CHANNELS']['ACTIVITY_MODERATION']:
+        return '```' + REGISTRY.summary() + '```'
+    return WRONG_CHANNEL_MESSAGE
+
+
+@executor.command('help', inline=True)
 def command_help(data):
-    message = '''```GETIN-Auth Discord bot
+    return '''```GETIN-Auth Discord bot
 
   !apps            Check apps
   !source          Get bot source
@@ -162,20 +141,42 @@ def command_help(data):
   !whitelist       Whitelist a player for the killboard check
   !unwhitelist     Remove a player from the killboard check whitelist
   !query           Query the database. Possible queries: reddit, char
+  !activity        Show a main's activity history from past killboard checks
+  !stats           Show command, HTTP, database and job latency stats
 ```'''
-    bot.send_message(data['d']['channel_id'], message)
 
 
+warm_up = util.prewarm(PREWARM_TIMEOUT)
 logger.info('Connecting to the socket')
 bot.connect_to_websocket()
-while not bot.connected:
-    time.sleep(1)
+bot.ready.wait()
 logger.info('Connected')
-time.sleep(3)
 bot.set_status('do !help')
-logger.info('Starting scheduled events')
-scheduler.run()
-logger.info('Started')
+if wait(warm_up, PREWARM_TIMEOUT).not_done:
+    logger.warning('Cache warm-up is still running, continuing startup')
+util.messages.start()
+if config.get('METRICS', {}).get('PORT'):
+    MetricsServer(config['METRICS'].get('HOST', '127.0.0.1'), config['METRICS']['PORT']).start()
+settings.start()
+if RUNS_SCHEDULER:
+    if config.get('REDISQ', {}).get('ENABLED'):
+        util.kill_feed = KillFeed(util, config['REDISQ'])
+        util.kill_feed.start()
+    if config.get('APPS_PUSH', {}).get('PORT'):
+        AppPushReceiver(
+            config['APPS_PUSH'].get('HOST', '127.0.0.1'),
+            config['APPS_PUSH']['PORT'],
+            config['API_SECRET'],
+            lambda: scheduler.run_now('check_apps')
+        ).start()
+    logger.info('Starting scheduled events')
+    scheduler.start()
+else:
+    logger.info('Gateway shard {} of {} only answers commands; shard 0 runs scheduled events'.format(*GATEWAY_SHARD))
+startup_time = time.monotonic() - STARTED
+REGISTRY.observe('startup_seconds', startup_time)
+logger.info('Started in {:.1f}s'.format(startup_time))
 logger.info('Going into run loop')
 bot.keep_running()
 logger.warning('Run loop exited; bot no longer running')
+log_listener.stop()
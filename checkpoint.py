@@ -0,0 +1,139 @@
+from threading import Lock
+from time import time
+import sqlite3
+import zlib
+
+
+class SweepCheckpoint:
+
+    def __init__(self, path, shards=1):
+        """Persists killboard sweep progress so a restart can pick up where it left off
+
+        Every main's result is written as soon as it is known. A run that
+        was interrupted is resumed by skipping the mains already checked
+        since it started. With more than one shard, each run only covers the
+        mains whose name hashes to the current shard, and the shard number
+        advances when a run finishes. A full pass starts with shard 0; only
+        results from the current pass count, so a main whose check failed in
+        any shard of it has no result rather than a stale one.
+
+        Args:
+            path (str): path to the local sqlite file
+            shards (int): number of slices the roster is split into
+        """
+        self.shards = max(1, shards)
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS sweep_state (id INTEGER PRIMARY KEY CHECK (id = 0), started REAL, shard INTEGER NOT NULL)'
+        )
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(sweep_state)')]
+        if 'pass_started' not in columns:
+            self.connection.execute('ALTER TABLE sweep_state ADD COLUMN pass_started REAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS sweep_results (name TEXT PRIMARY KEY, inactive INTEGER NOT NULL, checked REAL NOT NULL)'
+        )
+        self.connection.execute('INSERT OR IGNORE INTO sweep_state (id, started, shard) VALUES (0, NULL, 0)')
+        self.connection.commit()
+
+    def _state(self):
+        return self.connection.execute('SELECT started, shard FROM sweep_state WHERE id = 0').fetchone()
+
+    def shard_of(self, name):
+        """Gets the shard a main belongs to
+
+        Args:
+            name (str): main character name
+
+        Returns:
+            int: shard number
+        """
+        return zlib.crc32(name.casefold().encode('utf-8')) % self.shards
+
+    def pending(self):
+        """Checks if a run was started and never finished
+
+        Returns:
+            bool: True if there is a run to resume
+        """
+        with self.lock:
+            return self._state()[0] is not None
+
+    def begin(self, max_age):
+        """Starts a run, or resumes the unfinished one
+
+        Args:
+            max_age (int): an unfinished run older than this many seconds is started over
+
+        Returns:
+            tuple: (shard, already checked mains) for the run
+        """
+        now = time()
+        with self.lock:
+            started, shard = self._state()
+            if started is None or started < now - max_age or shard >= self.shards:
+                started, shard = now, shard % self.shards
+                self.connection.execute('UPDATE sweep_state SET started = ?, shard = ? WHERE id = 0', (started, shard))
+                self.connection.execute(
+                    'UPDATE sweep_state SET pass_started = ? WHERE id = 0 AND (? = 0 OR pass_started IS NULL)', (started, shard)
+                )
+                self.connection.commit()
+                return shard, set()
+            done = {row[0] for row in self.connection.execute('SELECT name FROM sweep_results WHERE checked >= ?', (started, ))}
+        return shard, done
+
+    def record(self, results):
+        """Saves mains' results
+
+        Args:
+            results (dict): main name -> True if the main has no recent kills
+        """
+        now = time()
+        with self.lock:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO sweep_results (name, inactive, checked) VALUES (?, ?, ?)',
+                [(name, int(inactive), now) for name, inactive in results.items()]
+            )
+            self.connection.commit()
+
+    def checked(self):
+        """Gets the mains checked so far in the current run
+
+        Returns:
+            set: main names
+        """
+        with self.lock:
+            started = self._state()[0]
+            if started is None:
+                return set()
+            return {row[0] for row in self.connection.execute('SELECT name FROM sweep_results WHERE checked >= ?', (started, ))}
+
+    def finish(self):
+        """Marks the current run as done and moves on to the next shard
+
+        Returns:
+            bool: True if the finished run was the last shard of a full pass
+        """
+        with self.lock:
+            shard = self._state()[1]
+            self.connection.execute(
+                'UPDATE sweep_state SET started = NULL, shard = ? WHERE id = 0', ((shard + 1) % self.shards, )
+            )
+            self.connection.commit()
+        return shard == self.shards - 1
+
+    def results(self, names):
+        """Gets each main's result from the current pass
+
+        Args:
+            names (list): mains to consider
+
+        Returns:
+            dict: main name -> True if the main had no recent kills, for mains checked in this pass
+        """
+        with self.lock:
+            latest = dict(self.connection.execute(
+                'SELECT name, inactive FROM sweep_results WHERE checked >= (SELECT pass_started FROM sweep_state WHERE id = 0)'
+            ))
+        return {name: bool(latest[name]) for name in names if name in latest}
+
@@ -0,0 +1,119 @@
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from time import time
+import sqlite3
+import json
+
+
+AFFILIATION_URL = 'https://esi.tech.ccp.is/latest/characters/affiliation/?datasource=tranquility'
+AFFILIATION_BATCH_SIZE = 1000
+
+
+def get_affiliations(http, limiter, character_ids):
+    """Resolves the current corporation of many characters in bulk
+
+    Args:
+        http (http_client.HttpClient): shared HTTP client
+        limiter (sweep.HostLimiter): limiter for ESI requests
+        character_ids (list): character ids
+
+    Returns:
+        dict: character id -> corporation id
+    """
+    ids = sorted(set(int(e) for e in character_ids))
+    affiliations = {}
+    for start in range(0, len(ids), AFFILIATION_BATCH_SIZE):
+        r = http.post(AFFILIATION_URL, limiter=limiter, json=ids[start:start + AFFILIATION_BATCH_SIZE])
+        if r.status_code != 200:
+            raise Exception('Status code was {}, not 200'.format(r.status_code))
+        for e in r.json():
+            affiliations[e['character_id']] = e['corporation_id']
+    return affiliations
+
+
+class CorpHistoryCache:
+
+    URL = 'https://esi.tech.ccp.is/latest/characters/{}/corporationhistory/?datasource=tranquility'
+
+    def __init__(self, path, logger, http, limiter):
+        """On-disk cache of ESI corporation history responses
+
+        Entries are keyed by character id and honour ESI's ``Expires`` and
+        ``ETag`` headers: fresh entries are served without a request, stale
+        ones are revalidated with ``If-None-Match``.
+
+        Args:
+            path (str): path to the local sqlite file
+            logger (logging.Logger): bot logger
+            http (http_client.HttpClient): shared HTTP client
+            limiter (sweep.HostLimiter): limiter for ESI requests
+        """
+        self.logger = logger
+        self.http = http
+        self.limiter = limiter
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS corp_history ('
+            'character_id INTEGER PRIMARY KEY, etag TEXT, expires REAL NOT NULL, body TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def parse_expires(headers):
+        """Converts an ``Expires`` header to a timestamp
+
+        Args:
+            headers (dict): response headers
+
+        Returns:
+            float: unix timestamp; now if the header is missing or invalid
+        """
+        try:
+            return parsedate_to_datetime(headers['Expires']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return time()
+
+    def _load(self, character_id):
+        with self.lock:
+            return self.connection.execute(
+                'SELECT etag, expires, body FROM corp_history WHERE character_id = ?', (character_id, )
+            ).fetchone()
+
+    def _store(self, character_id, etag, expires, body):
+        with self.lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO corp_history (character_id, etag, expires, body) VALUES (?, ?, ?, ?)',
+                (character_id, etag, expires, body)
+            )
+            self.connection.commit()
+
+    def get(self, character_id, allow_stale=False):
+        """Gets a character's corporation history, using the cache where possible
+
+        Args:
+            character_id (int): character id
+            allow_stale (bool): serve an expired entry rather than making a request
+
+        Returns:
+            list: corporation history entries from ESI
+        """
+        character_id = int(character_id)
+        cached = self._load(character_id)
+        if cached and (allow_stale or cached[1] > time()):
+            return json.loads(cached[2])
+        headers = {}
+        if cached and cached[0]:
+            headers['If-None-Match'] = cached[0]
+        url = CorpHistoryCache.URL.format(character_id)
+        r = self.http.get(url, limiter=self.limiter, headers=headers)
+        if r.status_code == 304 and cached:
+            self._store(character_id, r.headers.get('ETag', cached[0]), CorpHistoryCache.parse_expires(r.headers), cached[2])
+            return json.loads(cached[2])
+        if r.status_code != 200:
+            if cached:
+                self.logger.warning('Got status code {} from {}, using cached copy'.format(r.status_code, url))
+                return json.loads(cached[2])
+            raise Exception('Status code was {}, not 200'.format(r.status_code))
+        self._store(character_id, r.headers.get('ETag'), CorpHistoryCache.parse_expires(r.headers), r.text)
+        return r.json()
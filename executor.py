@@ -0,0 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock, Timer
+
+from metrics import REGISTRY
+
+
+EXECUTOR_DEFAULTS = {
+    'WORKERS': 4,
+    'MAX_PENDING': 16,
+    'TIMEOUT': 60,
+    'ACK_AFTER': 2
+}
+BUSY_MESSAGE = 'The bot is busy right now, please try again in a minute'
+ACK_MESSAGE = 'Working on it...'
+TIMEOUT_MESSAGE = 'That command took too long and was abandoned'
+ERROR_MESSAGE = 'An error occurred in the processing of that command'
+
+
+class CommandExecutor:
+
+    def __init__(self, bot, messages, logger, config=None):
+        """Runs command handlers on a bounded worker pool
+
+        Handlers return the reply text instead of sending it. Slow handlers
+        get a "working on it" acknowledgement, handlers that run past their
+        timeout have their reply suppressed, and commands are turned away
+        while the pool is saturated.
+
+        Args:
+            bot (pycord.Pycord): bot object to register commands on
+            messages (messages.MessageQueue): outbound message queue
+            logger (logging.Logger): bot logger
+            config (dict): optional COMMANDS section from config.json
+        """
+        self.bot = bot
+        self.messages = messages
+        self.logger = logger
+        merged = dict(EXECUTOR_DEFAULTS, **(config or {}))
+        self.timeout = merged['TIMEOUT']
+        self.ack_after = merged['ACK_AFTER']
+        self.slots = BoundedSemaphore(merged['WORKERS'] + merged['MAX_PENDING'])
+        self.pool = ThreadPoolExecutor(max_workers=merged['WORKERS'], thread_name_prefix='command')
+
+    def command(self, name, timeout=None, inline=False):
+        """Decorator to register a command handler
+
+        Args:
+            name (str): command name
+            timeout (int): seconds before the reply is abandoned; defaults to the configured TIMEOUT
+            inline (bool): run on the gateway thread (for trivial handlers)
+
+        Returns:
+            Method decorator
+        """
+        def inner(f):
+            def dispatch(data):
+                if inline:
+                    self._reply(name, f, data)
+                else:
+                    self.submit(name, f, data, timeout or self.timeout)
+            self.bot.register_command(name, dispatch)
+            return f
+        return inner
+
+    def _run(self, name, f, data):
+        try:
+            with REGISTRY.timed('command_seconds', command=name):
+                return f(data)
+        except Exception as e:
+            self.logger.error('Exception in !{}: {}'.format(name, str(e)))
+            return ERROR_MESSAGE
+
+    def _reply(self, name, f, data):
+        self.messages.enqueue(data['d']['channel_id'], self._run(name, f, data))
+
+    def submit(self, name, f, data, timeout):
+        """Queues a handler on the worker pool
+
+        Args:
+            name (str): command name
+            f (callable): handler, returning the reply text
+            data (dict): gateway message payload
+            timeout (int): seconds before the reply is abandoned
+        """
+        channel = data['d']['channel_id']
+        if not self.slots.acquire(blocking=False):
+            self.logger.warning('Command pool saturated, turning away !' + name)
+            self.messages.enqueue(channel, BUSY_MESSAGE)
+            return
+        state = {'done': False}
+        lock = Lock()
+
+        def finish(reply):
+            with lock:
+                if state['done']:
+                    return
+                state['done'] = True
+            ack.cancel()
+            expire.cancel()
+            self.messages.enqueue(channel, reply)
+
+        def acknowledge():
+            with lock:
+                if not state['done']:
+                    self.messages.enqueue(channel, ACK_MESSAGE)
+
+        def work():
+            try:
+                finish(self._run(name, f, data))
+            finally:
+                self.slots.release()
+
+        def abandon():
+            self.logger.error('!{} timed out after {}s'.format(name, timeout))
+            finish(TIMEOUT_MESSAGE)
+
+        ack = Timer(self.ack_after, acknowledge)
+        expire = Timer(timeout, abandon)
+        ack.daemon = expire.daemon = True
+        ack.start()
+        expire.start()
+        self.pool.submit(work)
@@ -0,0 +1,271 @@
+from threading import Condition, Event, Lock
+from time import monotonic
+import json
+import sys
+import zlib
+
+from pycord import Pycord, WebSocketEvent
+
+
+class GatewayBot(Pycord):
+    """Pycord client that also hands gateway dispatch events to listeners
+
+    Pycord only routes ``MESSAGE_CREATE`` to registered commands; this
+    subclass lets other parts of the bot subscribe to any dispatch event
+    (``GUILD_CREATE``, ``GUILD_ROLE_UPDATE``, ...) with ``on``. ``ready``
+    is set once the gateway sends READY. Passing ``shard=[shard_id,
+    shard_count]`` identifies as one gateway shard, so the bot's guilds can be
+    split over several processes (bot.py only runs scheduled jobs on shard 0).
+    """
+
+    def __init__(self, *args, shard=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shard = shard
+        self._listeners = {}
+        self.ready = Event()
+        self.on('READY')(lambda data: self.ready.set())
+
+    def on(self, event):
+        """Decorator to register a listener for a gateway dispatch event
+
+        The listener is called with the event's ``d`` payload.
+
+        Args:
+            event (str): dispatch event name, like 'GUILD_CREATE'
+
+        Returns:
+            Method decorator
+        """
+        def inner(f):
+            self._listeners.setdefault(event, []).append(f)
+            return f
+        return inner
+
+    def _ws_on_open(self, ws):
+        if not self.shard:
+            super()._ws_on_open(ws)
+            return
+        payload = {
+            'op': WebSocketEvent.IDENTIFY.value,
+            'd': {
+                'token': self.token,
+                'properties': {
+                    '$os': sys.platform,
+                    '$browser': 'Pycord',
+                    '$device': 'Pycord',
+                    '$referrer': '',
+                    '$referring_domain': ''
+                },
+                'compress': True,
+                'large_threshold': 250,
+                'shard': list(self.shard)
+            }
+        }
+        self.logger.debug('Sending identify payload for shard {}'.format(self.shard))
+        ws.send(json.dumps(payload))
+        self.connected = True
+
+    def _ws_on_message(self, ws, raw):
+        if isinstance(raw, bytes):
+            raw = zlib.decompress(raw, 15, 10490000).decode('utf-8')
+        data = json.loads(raw)
+        if data.get('op') == 0:
+            for listener in self._listeners.get(data['t'], []):
+                try:
+                    listener(data['d'])
+                except Exception as e:
+                    self.logger.error('Exception in {} listener: {}'.format(data['t'], str(e)))
+        super()._ws_on_message(ws, raw)
+
+
+class GuildCache:
+
+    def __init__(self, bot, http):
+        """Local copy of guilds, their roles (by name) and members' role sets
+
+        Kept current from gateway events, so reading roles needs no REST
+        calls. Anything missing (for example members of a large guild that
+        weren't in GUILD_CREATE) is fetched over REST once and then cached.
+        Identical role sets are shared between members, so memory grows with
+        the number of distinct role combinations rather than members.
+
+        Args:
+            bot (GatewayBot): bot object
+            http (http_client.HttpClient): shared HTTP client, used for role changes
+        """
+        self.bot = bot
+        self.http = http
+        self.lock = Lock()
+        self.guild_created = Condition(self.lock)
+        self.guilds = {}
+        self.roles = {}
+        self.members = {}
+        self.role_sets = {}
+        bot.on('READY')(self.on_ready)
+        bot.on('GUILD_CREATE')(self.on_guild_create)
+        bot.on('GUILD_DELETE')(self.on_guild_delete)
+        bot.on('GUILD_ROLE_CREATE')(self.on_role_update)
+        bot.on('GUILD_ROLE_UPDATE')(self.on_role_update)
+        bot.on('GUILD_ROLE_DELETE')(self.on_role_delete)
+        bot.on('GUILD_MEMBER_ADD')(self.on_member_update)
+        bot.on('GUILD_MEMBER_UPDATE')(self.on_member_update)
+        bot.on('GUILD_MEMBER_REMOVE')(self.on_member_remove)
+
+    def _intern(self, roles):
+        roles = frozenset(roles)
+        return self.role_sets.setdefault(roles, roles)
+
+    def on_ready(self, data):
+        with self.lock:
+            for guild in data.get('guilds', []):
+                self.guilds.setdefault(guild['id'], guild.get('name'))
+
+    def on_guild_create(self, data):
+        with self.guild_created:
+            self.guilds[data['id']] = data.get('name')
+            self.roles[data['id']] = {role['name']: role['id'] for role in data.get('roles', [])}
+            self.members[data['id']] = {
+                member['user']['id']: self._intern(member['roles']) for member in data.get('members', [])
+            }
+            self.guild_created.notify_all()
+
+    def on_guild_delete(self, data):
+        with self.lock:
+            self.guilds.pop(data['id'], None)
+            self.roles.pop(data['id'], None)
+            self.members.pop(data['id'], None)
+
+    def on_role_update(self, data):
+        with self.lock:
+            roles = self.roles.setdefault(data['guild_id'], {})
+            for name in [name for name, role_id in roles.items() if role_id == data['role']['id']]:
+                del roles[name]
+            roles[data['role']['name']] = data['role']['id']
+
+    def on_role_delete(self, data):
+        with self.lock:
+            roles = self.roles.get(data['guild_id'], {})
+            for name in [name for name, role_id in roles.items() if role_id == data['role_id']]:
+                del roles[name]
+
+    def on_member_update(self, data):
+        with self.lock:
+            self.members.setdefault(data['guild_id'], {})[data['user']['id']] = self._intern(data['roles'])
+
+    def on_member_remove(self, data):
+        with self.lock:
+            self.members.get(data['guild_id'], {}).pop(data['user']['id'], None)
+
+    def warm(self, timeout=None, guild_timeout=10):
+        """Waits for READY and the GUILD_CREATEs that follow it, then fetches roles for any guild still missing
+
+        Guilds are unavailable in READY and filled in by GUILD_CREATE
+        shortly after, so REST is only used for the ones that haven't
+        arrived by the deadline.
+
+        Args:
+            timeout (float): seconds to wait for READY
+            guild_timeout (float): seconds to wait for GUILD_CREATE after READY
+
+        Returns:
+            int: number of guilds whose roles were fetched
+        """
+        if not self.bot.ready.wait(timeout):
+            return 0
+        guild_ids = self.guild_ids()
+        deadline = monotonic() + guild_timeout
+        with self.guild_created:
+            while True:
+                missing = [guild_id for guild_id in guild_ids if guild_id not in self.roles]
+                remaining = deadline - monotonic()
+                if not missing or remaining <= 0:
+                    break
+                self.guild_created.wait(remaining)
+        for guild_id in missing:
+            self.role_ids(guild_id)
+        return len(missing)
+
+    def guild_ids(self):
+        """Gets the IDs of every connected guild
+
+        Returns:
+            list: guild snowflake ids
+        """
+        with self.lock:
+            ids = list(self.guilds)
+        if not ids:
+            for guild in self.bot.get_connected_guilds():
+                with self.lock:
+                    self.guilds[guild['id']] = guild.get('name')
+                ids.append(guild['id'])
+        return ids
+
+    def role_ids(self, guild_id):
+        """Gets a guild's roles
+
+        Args:
+            guild_id (str): guild snowflake id
+
+        Returns:
+            dict: role name -> role id
+        """
+        with self.lock:
+            roles = self.roles.get(guild_id)
+        if roles is None:
+            roles = {role['name']: role['id'] for role in self.bot.get_all_guild_roles(guild_id)}
+            with self.lock:
+                self.roles[guild_id] = roles
+        return roles
+
+    def member_roles(self, guild_id, member_id):
+        """Gets a member's role ids
+
+        Args:
+            guild_id (str): guild snowflake id
+            member_id (str): user snowflake id
+
+        Returns:
+            set: role ids
+        """
+        with self.lock:
+            roles = self.members.get(guild_id, {}).get(member_id)
+        if roles is None:
+            roles = self.bot.get_guild_member_by_id(guild_id, member_id)['roles']
+            with self.lock:
+                roles = self.members.setdefault(guild_id, {})[member_id] = self._intern(roles)
+        return set(roles)
+
+    def _change_member_role(self, method, guild_id, member_id, role_id):
+        url = Pycord.url_base + 'guilds/{}/members/{}/roles/{}'.format(guild_id, member_id, role_id)
+        r = self.http.request(method, url, headers=self.bot._build_headers())
+        if r.status_code != 204:
+            raise Exception('Status code was {}, not 204'.format(r.status_code))
+        with self.lock:
+            roles = self.members.get(guild_id, {}).get(member_id)
+            if roles is not None:
+                roles = set(roles)
+                if method == 'PUT':
+                    roles.add(role_id)
+                else:
+                    roles.discard(role_id)
+                self.members[guild_id][member_id] = self._intern(roles)
+
+    def add_member_role(self, guild_id, member_id, role_id):
+        """Gives a member one role, leaving their other roles alone
+
+        Args:
+            guild_id (str): guild snowflake id
+            member_id (str): user snowflake id
+            role_id (str): role snowflake id
+        """
+        self._change_member_role('PUT', guild_id, member_id, role_id)
+
+    def remove_member_role(self, guild_id, member_id, role_id):
+        """Takes one role from a member, leaving their other roles alone
+
+        Args:
+            guild_id (str): guild snowflake id
+            member_id (str): user snowflake id
+            role_id (str): role snowflake id
+        """
+        self._change_member_role('DELETE', guild_id, member_id, role_id)
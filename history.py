@@ -0,0 +1,96 @@
+from threading import Lock
+from time import time
+import sqlite3
+
+
+class ActivityHistory:
+
+    def __init__(self, path):
+        """Per-main activity history and what each guild was last told
+
+        History is run-length encoded: a main gets a new row only when its
+        status changes, otherwise the latest row's ``until`` is moved
+        forward. ``report_state`` holds, per guild, the mains that were
+        inactive or whitelisted in the last report, which delta reports are
+        computed against.
+
+        Args:
+            path (str): path to the local sqlite file
+        """
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS activity_history ('
+            'name TEXT NOT NULL, since REAL NOT NULL, until REAL NOT NULL, inactive INTEGER NOT NULL, PRIMARY KEY (name, since))'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS report_state (guild TEXT NOT NULL, name TEXT NOT NULL, status TEXT NOT NULL, PRIMARY KEY (guild, name))'
+        )
+        self.connection.commit()
+
+    def record(self, results):
+        """Adds a sweep's results to the history
+
+        Args:
+            results (dict): main name -> True if the main had no recent kills
+        """
+        now = time()
+        with self.lock:
+            latest = {
+                row[0]: (row[1], row[2]) for row in self.connection.execute(
+                    'SELECT name, MAX(since), inactive FROM activity_history GROUP BY name'
+                )
+            }
+            extend, insert = [], []
+            for name, inactive in results.items():
+                previous = latest.get(name)
+                if previous and previous[1] == int(inactive):
+                    extend.append((now, name, previous[0]))
+                else:
+                    insert.append((name, now, now, int(inactive)))
+            self.connection.executemany('UPDATE activity_history SET until = ? WHERE name = ? AND since = ?', extend)
+            self.connection.executemany('INSERT INTO activity_history (name, since, until, inactive) VALUES (?, ?, ?, ?)', insert)
+            self.connection.commit()
+
+    def get(self, name, limit=10):
+        """Gets a main's most recent history
+
+        Args:
+            name (str): main character name
+            limit (int): maximum rows
+
+        Returns:
+            list: (since, until, inactive) tuples, newest first
+        """
+        with self.lock:
+            return [
+                (since, until, bool(inactive)) for since, until, inactive in self.connection.execute(
+                    'SELECT since, until, inactive FROM activity_history WHERE name = ? ORDER BY since DESC LIMIT ?', (name, limit)
+                )
+            ]
+
+    def last_report(self, guild):
+        """Gets what a guild's last report contained
+
+        Args:
+            guild (str): guild key
+
+        Returns:
+            dict: main name -> 'inactive' or 'whitelisted'
+        """
+        with self.lock:
+            return dict(self.connection.execute('SELECT name, status FROM report_state WHERE guild = ?', (guild, )))
+
+    def set_last_report(self, guild, state):
+        """Replaces what a guild's last report contained
+
+        Args:
+            guild (str): guild key
+            state (dict): main name -> 'inactive' or 'whitelisted'
+        """
+        with self.lock:
+            self.connection.execute('DELETE FROM report_state WHERE guild = ?', (guild, ))
+            self.connection.executemany(
+                'INSERT INTO report_state (guild, name, status) VALUES (?, ?, ?)', [(guild, k, v) for k, v in state.items()]
+            )
+            self.connection.commit()
@@ -0,0 +1,268 @@
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY
+
+
+HTTP_DEFAULTS = {
+    'TIMEOUT': 10,
+    'RETRIES': 3,
+    'BACKOFF': 0.5,
+    'POOL_SIZE': 10,
+    'HOST_OVERRIDES': {},
+    'GOVERNOR': {
+        'SLOW_BELOW': 50,
+        'PAUSE_BELOW': 10,
+        'MAX_PAUSE': 300
+    }
+}
+RETRY_STATUS_CODES = (420, 429, 500, 502, 503, 504)
+THROTTLE_STATUS_CODES = (420, 429)
+
+
+class HostGovernor:
+
+    def __init__(self, host, logger, slow_below, pause_below, max_pause):
+        """Paces requests to one host to stay clear of its error limit
+
+        ESI reports its error budget in ``X-Esi-Error-Limit-Remain`` and
+        ``X-Esi-Error-Limit-Reset``. Once fewer than ``slow_below`` errors
+        are left, requests are spaced out so the rest of the budget lasts
+        until the window resets; at ``pause_below`` the host is paused
+        until the reset. A 420 or 429 (zKB's answer to aggressive clients)
+        pauses the host for its ``Retry-After``, or for an exponentially
+        growing time if it didn't send one.
+
+        Args:
+            host (str): host the governor is for
+            logger (logging.Logger): bot logger
+            slow_below (int): remaining errors at which requests start being spaced out
+            pause_below (int): remaining errors at which the host is paused
+            max_pause (int): longest pause in seconds
+        """
+        self.host = host
+        self.logger = logger
+        self.slow_below = slow_below
+        self.pause_below = pause_below
+        self.max_pause = max_pause
+        self.lock = Lock()
+        self.paused_until = 0
+        self.spacing = 0
+        self.next_slot = 0
+        self.strikes = 0
+
+    def wait(self):
+        """Blocks until the next request to the host may be sent"""
+        with self.lock:
+            now = monotonic()
+            start = max(now, self.paused_until, self.next_slot)
+            self.next_slot = start + self.spacing
+        if start > now:
+            sleep(start - now)
+
+    def _pause(self, now, seconds, reason):
+        seconds = min(seconds, self.max_pause)
+        if now + seconds > self.paused_until:
+            if self.paused_until <= now:
+                self.logger.warning('Pausing requests to {} for {:.0f}s ({})'.format(self.host, seconds, reason))
+            self.paused_until = now + seconds
+            REGISTRY.inc('http_throttled_total', host=self.host, reason=reason)
+
+    def observe(self, response):
+        """Updates the pacing from a response's status and headers
+
+        Args:
+            response (requests.Response): response from the host
+        """
+        remain = response.headers.get('X-Esi-Error-Limit-Remain', '')
+        reset = response.headers.get('X-Esi-Error-Limit-Reset', '')
+        with self.lock:
+            now = monotonic()
+            if remain.isdigit() and reset.isdigit():
+                remain, reset = int(remain), int(reset)
+                if remain <= self.pause_below:
+                    self._pause(now, reset + 1, 'error limit')
+                    self.spacing = 0
+                elif remain <= self.slow_below:
+                    self.spacing = reset / (remain - self.pause_below)
+                else:
+                    self.spacing = 0
+            if response.status_code in THROTTLE_STATUS_CODES:
+                self.strikes += 1
+                retry_after = response.headers.get('Retry-After', '')
+                seconds = float(retry_after) if retry_after.isdigit() else 2 ** self.strikes
+                self._pause(now, seconds, str(response.status_code))
+            elif response.status_code < 400:
+                self.strikes = 0
+
+
+class HttpClient:
+
+    def __init__(self, logger, config=None):
+        """Shared HTTP client for every outbound call the bot makes
+
+        Keeps one pooled keep-alive ``requests.Session`` per host, applies a
+        default timeout and retries connection errors, 5xx, 420 and 429
+        responses with jittered exponential backoff. ``HOST_OVERRIDES`` maps
+        a host to another base URL (used to point the bot at local stand-ins).
+        Each host also gets a ``HostGovernor`` that slows down or pauses
+        requests as the host's error budget runs low.
+
+        Args:
+            logger (logging.Logger): bot logger
+            config (dict): optional HTTP section from config.json
+        """
+        self.logger = logger
+        merged = dict(HTTP_DEFAULTS, **(config or {}))
+        self.timeout = merged['TIMEOUT']
+        self.retries = merged['RETRIES']
+        self.backoff = merged['BACKOFF']
+        self.pool_size = merged['POOL_SIZE']
+        self.host_overrides = merged['HOST_OVERRIDES']
+        self.governor_config = dict(HTTP_DEFAULTS['GOVERNOR'], **merged['GOVERNOR'])
+        self.sessions = {}
+        self.governors = {}
+        self.lock = Lock()
+
+    def session_for(self, url):
+        """Gets (creating if needed) the pooled session for a URL's host
+
+        Args:
+            url (str): request URL
+
+        Returns:
+            requests.Session: session for the host
+        """
+        host = urlsplit(url).netloc
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self.sessions[host] = session
+            return session
+
+    def governor_for(self, host):
+        """Gets (creating if needed) the governor for a host
+
+        Args:
+            host (str): host name
+
+        Returns:
+            HostGovernor: governor for the host
+        """
+        with self.lock:
+            governor = self.governors.get(host)
+            if governor is None:
+                governor = HostGovernor(
+                    host,
+                    self.logger,
+                    self.governor_config['SLOW_BELOW'],
+                    self.governor_config['PAUSE_BELOW'],
+                    self.governor_config['MAX_PAUSE']
+                )
+                self.governors[host] = governor
+            return governor
+
+    def backoff_time(self, attempt, response=None):
+        """Gets how long to wait before the next attempt
+
+        Honours a numeric ``Retry-After`` header if the server sent one.
+
+        Args:
+            attempt (int): zero-based attempt number that just failed
+            response (requests.Response): failed response, if any
+
+        Returns:
+            float: seconds to sleep
+        """
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            return float(response.headers['Retry-After'])
+        return uniform(0, self.backoff * (2 ** attempt))
+
+    def _resolve(self, url):
+        parts = urlsplit(url)
+        if parts.netloc in self.host_overrides:
+            return self.host_overrides[parts.netloc].rstrip('/') + url[len(parts.scheme) + 3 + len(parts.netloc):]
+        return url
+
+    def warm(self, url, **kwargs):
+        """Opens a pooled connection to a URL's host ahead of the first real request
+
+        Makes a single HEAD request; any failure is only logged.
+
+        Args:
+            url (str): URL on the host to connect to
+            **kwargs: passed to ``requests.Session.head`` (e.g. ``verify``, to match the real requests)
+
+        Returns:
+            bool: True if the host answered
+        """
+        url = self._resolve(url)
+        try:
+            kwargs.setdefault('timeout', self.timeout)
+            self.session_for(url).head(url, **kwargs)
+            return True
+        except requests.RequestException as e:
+            self.logger.warning('Could not warm a connection to {}: {}'.format(url, str(e)))
+            return False
+
+    @staticmethod
+    def _timed_request(session, host, method, url, **kwargs):
+        start = monotonic()
+        try:
+            return session.request(method, url, **kwargs)
+        finally:
+            REGISTRY.observe('http_request_seconds', monotonic() - start, host=host)
+
+    def request(self, method, url, limiter=None, **kwargs):
+        """Makes a request, retrying transient failures
+
+        Args:
+            method (str): HTTP method
+            url (str): request URL
+            limiter (sweep.HostLimiter): optional limiter held around each attempt
+            **kwargs: passed to ``requests.Session.request``
+
+        Returns:
+            requests.Response: the final response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        url = self._resolve(url)
+        session = self.session_for(url)
+        governor = self.governor_for(host)
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                governor.wait()
+                if limiter:
+                    with limiter:
+                        response = self._timed_request(session, host, method, url, **kwargs)
+                else:
+                    response = self._timed_request(session, host, method, url, **kwargs)
+                governor.observe(response)
+                if response.status_code >= 400:
+                    REGISTRY.inc('http_errors_total', host=host, reason=str(response.status_code))
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.retries:
+                    return response
+                self.logger.warning('Got status code {} from {}, retrying'.format(response.status_code, url))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                REGISTRY.inc('http_errors_total', host=host, reason=type(e).__name__)
+                if attempt == self.retries:
+                    raise
+                self.logger.warning('Request to {} failed ({}), retrying'.format(url, str(e)))
+            sleep(self.backoff_time(attempt, response))
+
+    def get(self, url, limiter=None, **kwargs):
+        return self.request('GET', url, limiter=limiter, **kwargs)
+
+    def post(self, url, limiter=None, **kwargs):
+        return self.request('POST', url, limiter=limiter, **kwargs)
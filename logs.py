@@ -0,0 +1,88 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from queue import Queue
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+
+
+LOGGING_DEFAULTS = {
+    'JSON': False,
+    'ROTATE': {
+        'MAX_BYTES': 10485760,
+        'WHEN': None,
+        'BACKUP_COUNT': 7,
+        'COMPRESS': True
+    }
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single-line JSON object"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def gzip_rotator(source, dest):
+    """Compresses a rotated log segment, for use as a handler's ``rotator``
+
+    Args:
+        source (str): file being rotated out
+        dest (str): name for the compressed segment
+    """
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def configure_logging(logger, config):
+    """Sets up the bot logger so that callers only pay for putting records on a queue
+
+    Console and file output happen on a background listener thread. The
+    file rotates by size (or by time when ``ROTATE.WHEN`` is set), and old
+    segments are gzipped.
+
+    Args:
+        logger (logging.Logger): logger to configure
+        config (dict): LOGGING section from config.json
+
+    Returns:
+        logging.handlers.QueueListener: the started listener; stop it on exit to flush
+    """
+    rotate = dict(LOGGING_DEFAULTS['ROTATE'], **config.get('ROTATE', {}))
+    if config.get('JSON', LOGGING_DEFAULTS['JSON']):
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(style='{', fmt='{asctime} [{levelname}] {message}', datefmt='%Y-%m-%d %H:%M:%S')
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(config['LEVEL']['CONSOLE'])
+    if rotate['WHEN']:
+        file = TimedRotatingFileHandler(config['FILE'], when=rotate['WHEN'], backupCount=rotate['BACKUP_COUNT'], encoding='utf-8')
+    else:
+        file = RotatingFileHandler(config['FILE'], maxBytes=rotate['MAX_BYTES'], backupCount=rotate['BACKUP_COUNT'], encoding='utf-8')
+    if rotate['COMPRESS']:
+        file.namer = lambda name: name + '.gz'
+        file.rotator = gzip_rotator
+    file.setLevel(config['LEVEL']['FILE'])
+    for handler in (console, file):
+        handler.setFormatter(formatter)
+
+    queue = Queue()
+    logger.setLevel(config['LEVEL']['ALL'])
+    logger.addHandler(QueueHandler(queue))
+    listener = QueueListener(queue, console, file, respect_handler_level=True)
+    listener.start()
+    return listener
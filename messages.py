@@ -0,0 +1,252 @@
+from collections import deque
+from threading import Condition, Thread
+from time import monotonic, time
+
+from pycord import Pycord
+
+
+MESSAGE_LIMIT = 2000
+
+
+def pack_lines(lines, prefix='', suffix='', limit=MESSAGE_LIMIT):
+    """Packs lines, in order, into as few messages as possible
+
+    Each message is wrapped in prefix/suffix. A line too long to fit in a
+    message on its own is split across messages.
+
+    Args:
+        lines (list): lines of text
+        prefix (str): text each message starts with
+        suffix (str): text each message ends with
+        limit (int): maximum message length
+
+    Returns:
+        list: messages
+    """
+    room = limit - len(prefix) - len(suffix)
+    messages = []
+    current = ''
+    for line in lines:
+        while len(line) > room:
+            if current:
+                messages.append(prefix + current + suffix)
+                current = ''
+            messages.append(prefix + line[:room] + suffix)
+            line = line[room:]
+        candidate = current + '\n' + line if current else line
+        if len(candidate) > room:
+            messages.append(prefix + current + suffix)
+            candidate = line
+        current = candidate
+    if current:
+        messages.append(prefix + current + suffix)
+    return messages
+
+
+def split_message(content, limit=MESSAGE_LIMIT):
+    """Splits a message that is too long to send on line boundaries
+
+    If the message is one ``` block (plus any text before or after it),
+    every part is wrapped in its own fence, so no part is left with an
+    unclosed or unopened block.
+
+    Args:
+        content (str): message text
+        limit (int): maximum message length
+
+    Returns:
+        list: messages
+    """
+    if len(content) <= limit:
+        return [content]
+    start, end = content.find('```'), content.rfind('```')
+    if start == -1 or end == start or '```' in content[start + 3:end]:
+        return pack_lines(content.split('\n'), limit=limit)
+    head, body, tail = content[:start], content[start + 3:end], content[end + 3:]
+    messages = pack_lines(body.split('\n'), '```', '```', limit)
+    if head:
+        if len(head) + len(messages[0]) <= limit:
+            messages[0] = head + messages[0]
+        else:
+            messages = pack_lines(head.split('\n'), limit=limit) + messages
+    if tail:
+        if len(messages[-1]) + len(tail) <= limit:
+            messages[-1] += tail
+        else:
+            messages += pack_lines(tail.split('\n'), limit=limit)
+    return messages
+
+
+class MessageQueue(Thread):
+
+    def __init__(self, bot, http, logger):
+        """Single outbound queue for every message the bot posts
+
+        Callers enqueue and return at once. A background thread sends the
+        messages in order per channel. It tracks each channel's Discord
+        rate-limit bucket from the ``X-RateLimit-*`` headers and waits out
+        429s, including global ones.
+
+        Args:
+            bot (pycord.Pycord): bot object, used for auth headers
+            http (http_client.HttpClient): shared HTTP client
+            logger (logging.Logger): bot logger
+        """
+        super().__init__(name='Thread-message_queue', daemon=True)
+        self.bot = bot
+        self.http = http
+        self.logger = logger
+        self.condition = Condition()
+        self.pending = {}
+        self.order = deque()
+        self.buckets = {}
+        self.global_reset = 0
+        self.should_run = True
+
+    def enqueue(self, channel_id, content):
+        """Queues a message
+
+        Args:
+            channel_id (str): channel snowflake id
+            content (str): message text; longer messages are split
+        """
+        if not content:
+            return
+        self.enqueue_many(channel_id, split_message(content))
+
+    def enqueue_many(self, channel_id, messages):
+        """Queues several messages to go out in order
+
+        Args:
+            channel_id (str): channel snowflake id
+            messages (list): message texts
+        """
+        with self.condition:
+            queue = self.pending.setdefault(channel_id, deque())
+            if not queue:
+                self.order.append(channel_id)
+            queue.extend(messages)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.should_run = False
+            self.condition.notify()
+
+    def _ready_at(self, channel_id):
+        remaining, reset = self.buckets.get(channel_id, (1, 0))
+        ready = reset if remaining <= 0 else 0
+        return max(ready, self.global_reset)
+
+    def _next(self):
+        """Picks the next channel whose bucket allows a send
+
+        Returns:
+            tuple: (channel id, message) or (None, seconds to wait)
+        """
+        now = monotonic()
+        wait = None
+        for _ in range(len(self.order)):
+            channel_id = self.order[0]
+            ready = self._ready_at(channel_id)
+            if ready <= now:
+                self.order.rotate(-1)
+                return channel_id, self.pending[channel_id][0]
+            wait = ready - now if wait is None else min(wait, ready - now)
+            self.order.rotate(-1)
+        return None, wait
+
+    def _update_bucket(self, channel_id, response):
+        headers = response.headers
+        if 'X-RateLimit-Remaining' not in headers:
+            return
+        remaining = int(headers['X-RateLimit-Remaining'])
+        if 'X-RateLimit-Reset-After' in headers:
+            reset_after = float(headers['X-RateLimit-Reset-After'])
+        else:
+            reset_after = float(headers.get('X-RateLimit-Reset', 0)) - time()
+        self.buckets[channel_id] = (remaining, monotonic() + max(0, reset_after))
+
+    @staticmethod
+    def _rate_limit(response):
+        """Reads how long a 429 asks to wait, and whether the limit is global
+
+        Falls back to the Retry-After / X-RateLimit-Reset-After headers when
+        the body isn't JSON (e.g. an HTML page from a proxy).
+
+        Returns:
+            tuple: (seconds to wait, True if the limit is global)
+        """
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            body = {}
+        retry_after = body.get('retry_after')
+        if retry_after is None:
+            retry_after = response.headers.get('Retry-After') or response.headers.get('X-RateLimit-Reset-After') or 1
+        try:
+            retry_after = float(retry_after)
+        except ValueError:
+            retry_after = 1.0
+        # older API v6 responses report milliseconds, newer ones seconds
+        retry_after = retry_after / 1000 if retry_after > 60 else retry_after
+        return retry_after, bool(body.get('global') or response.headers.get('X-RateLimit-Global'))
+
+    def _send(self, channel_id, content):
+        """Posts a message
+
+        Returns:
+            bool: True if the message is done with (sent or dropped), False to retry it
+        """
+        url = Pycord.url_base + 'channels/{}/messages'.format(channel_id)
+        try:
+            r = self.http.session_for(url).post(url, headers=self.bot._build_headers(), json={'content': content}, timeout=self.http.timeout)
+        except Exception as e:
+            self.logger.error('Exception sending message to {}: {}'.format(channel_id, str(e)))
+            with self.condition:
+                self.buckets[channel_id] = (0, monotonic() + 5)
+            return False
+        with self.condition:
+            self._update_bucket(channel_id, r)
+            if r.status_code == 429:
+                retry_after, is_global = self._rate_limit(r)
+                until = monotonic() + retry_after
+                if is_global:
+                    self.global_reset = until
+                else:
+                    self.buckets[channel_id] = (0, until)
+                self.logger.warning('Rate limited sending to {}, retrying in {}s'.format(channel_id, retry_after))
+                return False
+            if r.status_code >= 500:
+                self.logger.error('Got status code {} sending message to {}, retrying'.format(r.status_code, channel_id))
+                self.buckets[channel_id] = (0, monotonic() + 5)
+                return False
+        if r.status_code != 200:
+            self.logger.error('Got status code {} sending message to {}, dropping it: {}'.format(r.status_code, channel_id, r.text))
+        return True
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if not self.should_run:
+                        return
+                    channel_id, item = self._next() if self.order else (None, None)
+                    if channel_id is not None:
+                        break
+                    self.condition.wait(item)
+            try:
+                sent = self._send(channel_id, item)
+            except Exception as e:
+                self.logger.error('Exception in message queue sending to {}: {}'.format(channel_id, str(e)))
+                with self.condition:
+                    self.buckets[channel_id] = (0, monotonic() + 5)
+                continue
+            if sent:
+                with self.condition:
+                    queue = self.pending[channel_id]
+                    queue.popleft()
+                    if not queue:
+                        self.order.remove(channel_id)
@@ -0,0 +1,181 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from time import monotonic
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+DESCRIPTIONS = {
+    'command_seconds': 'Bot command latency',
+    'http_request_seconds': 'Outbound HTTP request latency',
+    'sql_query_seconds': 'getin-auth database query latency',
+    'job_seconds': 'Scheduler job duration',
+    'startup_seconds': 'Time from process start until the bot was ready',
+    'prewarm_seconds': 'Startup cache warm-up duration',
+    'http_errors_total': 'Outbound HTTP requests that failed or returned an error status',
+    'http_throttled_total': 'Times requests to a host were paused to stay under its error limit'
+}
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP server that handles each request on its own thread (http.server's own needs Python 3.7)"""
+    daemon_threads = True
+
+
+class Registry:
+
+    def __init__(self):
+        """Thread-safe store of counters and latency histograms
+
+        Series are identified by a metric name plus a sorted tuple of
+        (label, value) pairs.
+        """
+        self.lock = Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    @staticmethod
+    def _key(labels):
+        # label values are rendered as text anyway; keeping them all str keeps series keys sortable
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        """Increments a counter
+
+        Args:
+            name (str): metric name
+            amount (float): amount to add
+            **labels: series labels
+        """
+        key = (name, Registry._key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        """Records a latency in a histogram
+
+        Args:
+            name (str): metric name
+            seconds (float): observed duration
+            **labels: series labels
+        """
+        key = (name, Registry._key(labels))
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0, 0.0]
+            series[0][bisect_left(BUCKETS, seconds)] += 1
+            series[1] += seconds
+            series[2] += 1
+            series[3] = max(series[3], seconds)
+
+    @contextmanager
+    def timed(self, name, **labels):
+        """Context manager that observes how long its body takes
+
+        Args:
+            name (str): histogram name
+            **labels: series labels
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, monotonic() - start, **labels)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs) + '}'
+
+    def render(self):
+        """Renders every series in the Prometheus text exposition format
+
+        Returns:
+            str: exposition text
+        """
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self.histograms.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append('# HELP {} {}'.format(name, DESCRIPTIONS.get(name, name)))
+                lines.append('# TYPE {} counter'.format(name))
+            lines.append('{}{} {}'.format(name, Registry._labels(labels), value))
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append('# HELP {} {}'.format(name, DESCRIPTIONS.get(name, name)))
+                lines.append('# TYPE {} histogram'.format(name))
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf', ), buckets):
+                cumulative += n
+                lines.append('{}_bucket{} {}'.format(name, Registry._labels(labels, [('le', bound)]), cumulative))
+            lines.append('{}_sum{} {}'.format(name, Registry._labels(labels), total))
+            lines.append('{}_count{} {}'.format(name, Registry._labels(labels), count))
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Builds a short human-readable summary for the !stats command
+
+        Returns:
+            str: one line per histogram series, then one per counter
+        """
+        with self.lock:
+            histograms = sorted((k, (v[1], v[2], v[3])) for k, v in self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines = []
+        for (name, labels), (total, count, slowest) in histograms:
+            lines.append('{}{}: {} calls, avg {:.0f}ms, max {:.0f}ms'.format(
+                name, Registry._labels(labels), count, total / count * 1000, slowest * 1000
+            ))
+        for (name, labels), value in counters:
+            lines.append('{}{}: {}'.format(name, Registry._labels(labels), value))
+        return '\n'.join(lines) or 'No metrics recorded yet'
+
+
+REGISTRY = Registry()
+
+
+class MetricsServer(Thread):
+
+    def __init__(self, host, port, registry=REGISTRY):
+        """Serves the registry at /metrics for Prometheus to scrape
+
+        Args:
+            host (str): address to bind, normally 127.0.0.1
+            port (int): port to bind
+            registry (Registry): metrics to expose
+        """
+        super().__init__(name='Thread-metrics', daemon=True)
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
@@ -0,0 +1,114 @@
+from threading import Thread
+from time import sleep, time
+
+
+REDISQ_DEFAULTS = {
+    'ENABLED': False,
+    'URL': 'https://redisq.zkillboard.com/listen.php',
+    'QUEUE_ID': '',
+    'TTW': 10,
+    'MAX_GAP': 300
+}
+
+
+class KillFeed(Thread):
+
+    def __init__(self, util, config):
+        """Long-running consumer of the zKillboard RedisQ kill feed
+
+        Every killmail with an accepted member among its attackers is
+        recorded in the activity ledger. While polling has been unbroken for
+        a whole activity window the ledger is complete, and the sweep can
+        report without querying zKB. ESI is then only asked for the corp
+        history of a main that has none cached yet.
+
+        Args:
+            util (util.Util): bot utility object
+            config (dict): REDISQ section from config.json
+        """
+        super().__init__(name='Thread-kill_feed', daemon=True)
+        self.util = util
+        merged = dict(REDISQ_DEFAULTS, **config)
+        self.url = merged['URL']
+        self.params = {'ttw': merged['TTW']}
+        if merged['QUEUE_ID']:
+            self.params['queueID'] = merged['QUEUE_ID']
+        self.timeout = merged['TTW'] + 10
+        self.max_gap = merged['MAX_GAP']
+        self.should_run = True
+        self._roster = None
+        self._member_ids = frozenset()
+
+    def stop(self):
+        self.should_run = False
+
+    def member_ids(self):
+        """Gets the IDs of every accepted character, rebuilt only when the roster changes
+
+        Returns:
+            frozenset: character ids
+        """
+        roster = self.util.members.roster()
+        if roster is not self._roster:
+            self._member_ids = frozenset(int(e) for entry in roster.values() for e in entry.alt_ids if e)
+            self._roster = roster
+        return self._member_ids
+
+    def handle(self, package):
+        """Records a single RedisQ package
+
+        Args:
+            package (dict): package from the feed
+
+        Returns:
+            list: member character ids credited with the kill
+        """
+        killmail = package['killmail']
+        member_ids = self.member_ids()
+        matched = [e['character_id'] for e in killmail.get('attackers', []) if e.get('character_id') in member_ids]
+        if matched:
+            self.util.activity.record(matched, self.util.killmail_timestamp(killmail))
+        return matched
+
+    def mark_polled(self):
+        """Extends the coverage window, restarting it if there was a gap"""
+        now = time()
+        state = self.util.activity.feed_state()
+        if state and now - state[1] <= self.max_gap:
+            self.util.activity.set_feed_state(state[0], now)
+        else:
+            self.util.activity.set_feed_state(now, now)
+
+    def covers(self, seconds):
+        """Checks if the feed has been polled without gaps for the last few seconds
+
+        Args:
+            seconds (int): length of the window
+
+        Returns:
+            bool: True if every kill in the window has been seen
+        """
+        state = self.util.activity.feed_state()
+        now = time()
+        return bool(state) and state[0] <= now - seconds and now - state[1] <= self.max_gap
+
+    def run(self):
+        self.util.logger.info('Starting kill feed consumer')
+        failures = 0
+        while self.should_run:
+            try:
+                r = self.util.http.get(self.url, params=self.params, timeout=self.timeout)
+                if r.status_code != 200:
+                    raise Exception('Status code was {}, not 200'.format(r.status_code))
+                package = r.json().get('package')
+                self.mark_polled()
+                failures = 0
+                if package:
+                    matched = self.handle(package)
+                    if matched:
+                        self.util.logger.debug('Kill feed: recorded kill {} for {}'.format(package.get('killID'), matched))
+            except Exception as e:
+                failures += 1
+                self.util.logger.error('Exception in kill feed: ' + str(e))
+                sleep(min(60, 2 ** failures))
+        self.util.logger.warning('Kill feed consumer stopped')
@@ -0,0 +1,174 @@
+from bisect import bisect_left
+from collections import namedtuple
+from difflib import get_close_matches
+from threading import Lock
+import sqlite3
+
+from metrics import REGISTRY
+
+RosterEntry = namedtuple('RosterEntry', ['main_id', 'alt_ids', 'alt_names'])
+Member = namedtuple('Member', [
+    'character_id', 'character_name', 'corporation', 'reddit', 'know_good_fits', 'know_scan', 'know_mass_and_time',
+    'know_organize_gank', 'know_when_to_pve', 'know_comms', 'know_appropriate_ships', 'know_intel', 'know_pvp',
+    'know_doctrine', 'main', 'status'
+])
+
+
+class AuthDatabase:
+
+    def __init__(self, path):
+        """Single long-lived read-only connection to the getin-auth database
+
+        Args:
+            path (str): path to getin-auth's data.db
+        """
+        self.path = path
+        self.lock = Lock()
+        self.connection = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True, check_same_thread=False)
+        self.connection.execute('PRAGMA query_only = 1')
+        self.connection.execute('PRAGMA mmap_size = 268435456')
+        self.connection.execute('PRAGMA cache_size = -16000')
+        self.connection.execute('PRAGMA temp_store = MEMORY')
+
+    def query(self, sql, params=(), name='query'):
+        """Runs a query on the shared connection
+
+        Args:
+            sql (str): SQL statement
+            params (tuple): statement parameters
+            name (str): label for the query's latency metric
+
+        Returns:
+            list: all result rows
+        """
+        with self.lock, REGISTRY.timed('sql_query_seconds', query=name):
+            return self.connection.execute(sql, params).fetchall()
+
+    def data_version(self):
+        """Gets a value that changes whenever another connection commits to the database
+
+        Returns:
+            int: sqlite data version
+        """
+        return self.query('PRAGMA data_version', name='data_version')[0][0]
+
+    def members(self):
+        """Loads every row of the member table
+
+        Returns:
+            list: Member records
+        """
+        return [Member(*row) for row in self.query('SELECT {} FROM member'.format(','.join(Member._fields)), name='members')]
+
+
+class MemberIndex:
+
+    def __init__(self, database):
+        """In-memory index of the member table
+
+        Rows are held as compact ``Member`` tuples, indexed by casefolded
+        character name and reddit name. The index is rebuilt only when
+        ``PRAGMA data_version`` shows getin-auth has written to the database.
+
+        Args:
+            database (AuthDatabase): getin-auth database
+        """
+        self.database = database
+        self.lock = Lock()
+        self.version = None
+        self.names = {}
+        self.reddits = {}
+        self.sorted_names = []
+        self.roster_entries = {}
+
+    def _build(self, members):
+        names = {}
+        reddits = {}
+        ids_by_name = {}
+        alts = {}
+        for member in members:
+            names.setdefault((member.character_name or '').casefold(), []).append(member)
+            if member.reddit:
+                reddits.setdefault(member.reddit.casefold(), []).append(member)
+            valid_id = member.character_id is not None and member.character_id != 'NULL'
+            if valid_id and member.character_name not in ids_by_name:
+                ids_by_name[member.character_name] = member.character_id
+            if member.status == 'Accepted':
+                entry = alts.setdefault(member.main, ([], []))
+                if valid_id:
+                    entry[0].append(member.character_id)
+                    entry[1].append(member.character_name)
+        self.names = names
+        self.reddits = reddits
+        self.sorted_names = sorted(names)
+        self.roster_entries = {
+            main: RosterEntry(ids_by_name.get(main), alt_ids, alt_names)
+            for main, (alt_ids, alt_names) in alts.items()
+        }
+
+    def refresh(self, force=False):
+        """Rebuilds the index if the database has changed since it was built
+
+        Args:
+            force (bool): rebuild regardless of the data version
+        """
+        with self.lock:
+            version = self.database.data_version()
+            if force or version != self.version:
+                self._build(self.database.members())
+                self.version = version
+
+    def roster(self):
+        """Gets every accepted main with its ID and alts
+
+        Returns:
+            dict: main name -> RosterEntry
+        """
+        self.refresh()
+        return self.roster_entries
+
+    def by_name(self, name):
+        """Finds members by character name, ignoring case
+
+        Args:
+            name (str): character name
+
+        Returns:
+            list: Member records
+        """
+        self.refresh()
+        return self.names.get(name.casefold(), [])
+
+    def by_reddit(self, reddit):
+        """Finds members by reddit name, ignoring case
+
+        Args:
+            reddit (str): reddit name
+
+        Returns:
+            list: Member records
+        """
+        self.refresh()
+        return self.reddits.get(reddit.casefold(), [])
+
+    def search(self, text, limit=5):
+        """Suggests character names by prefix, falling back to fuzzy matching
+
+        Args:
+            text (str): partial or misspelled character name
+            limit (int): maximum suggestions
+
+        Returns:
+            list: character names
+        """
+        self.refresh()
+        key = text.casefold()
+        names = self.sorted_names
+        matches = []
+        index = bisect_left(names, key)
+        while index < len(names) and names[index].startswith(key) and len(matches) < limit:
+            matches.append(names[index])
+            index += 1
+        if not matches:
+            matches = get_close_matches(key, names, n=limit)
+        return [self.names[e][0].character_name for e in matches]
@@ -1,30 +1,157 @@
-from threading import Thread
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Condition, Thread
+from time import monotonic, time
 
-import schedule
+from metrics import REGISTRY
+
+
+RESUME_DELAY = 60
+
+
+class Job:
+
+    def __init__(self, name, interval, func, first_run=None):
+        """A recurring scheduler job
+
+        Args:
+            name (str): job name, shown by !schedule
+            interval (int): seconds between runs
+            func (callable): called with no arguments
+            first_run (int): seconds until the first run; defaults to one interval
+        """
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.deadline = monotonic() + (interval if first_run is None else first_run)
+        self.running = False
+        self.last_duration = None
 
 
 class Scheduler(Thread):
 
-    def __init__(self, util, NEW_APPS_SLEEP_TIME, KILLBOARD_SLEEP_TIME):
+    def __init__(self, util, NEW_APPS_SLEEP_TIME, KILLBOARD_SLEEP_TIME, workers=2):
+        """Runs the recurring jobs
+
+        Keeps a heap of job deadlines and sleeps until the next one is due.
+        Jobs run on a small worker pool so a slow killboard sweep doesn't
+        delay the app check; a job that is still running when it comes due
+        again is skipped for that cycle. A sharded killboard sweep runs once
+        per shard per KILLBOARD_SLEEP_TIME, and a sweep interrupted by a
+        restart is resumed shortly after startup.
+
+        Args:
+            util (util.Util): bot utility object
+            NEW_APPS_SLEEP_TIME (int): seconds between application checks
+            KILLBOARD_SLEEP_TIME (int): seconds between killboard sweeps
+            workers (int): worker pool size
+        """
+        super().__init__(name='Thread-scheduler', daemon=True)
         self.util = util
         self.util.logger.debug('Configuring scheduler')
-        schedule.every(NEW_APPS_SLEEP_TIME).seconds.do(self.check_apps)
-        schedule.every(KILLBOARD_SLEEP_TIME).seconds.do(self.killboard)
+        self.condition = Condition()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.should_run = True
+        self.jobs = []
+        self.heap = []
+        self.sequence = count()
+        self.add_job('check_apps', NEW_APPS_SLEEP_TIME, self.check_apps)
+        self.add_job(
+            'killboard',
+            KILLBOARD_SLEEP_TIME // util.sweep_checkpoint.shards,
+            self.killboard,
+            first_run=RESUME_DELAY if util.sweep_checkpoint.pending() else None
+        )
+
+    def add_job(self, name, interval, func, first_run=None):
+        """Registers a recurring job; by default its first run is one interval from now
+
+        Args:
+            name (str): job name
+            interval (int): seconds between runs
+            func (callable): job body
+            first_run (int): seconds until the first run
+        """
+        job = Job(name, interval, func, first_run)
+        with self.condition:
+            self.jobs.append(job)
+            heappush(self.heap, (job.deadline, next(self.sequence), job))
+            self.condition.notify()
+
+    def run_now(self, name):
+        """Brings a job's next run forward to now
+
+        Args:
+            name (str): job name
+        """
+        with self.condition:
+            for job in self.jobs:
+                if job.name == name:
+                    job.deadline = monotonic()
+            self.heap = [(job.deadline, next(self.sequence), job) for job in self.jobs]
+            heapify(self.heap)
+            self.condition.notify()
 
     def check_apps(self):
         self.util.logger.info('Scheduler: check_apps()')
         res = self.util.check_apps(from_scheduler=True)
         if res and res != 'Error!':
-            self.util.bot.send_message(self.util.config['PRIVATE_COMMAND_CHANNELS']['RECRUITMENT'], res)
+            for guild in self.util.report_guilds('RECRUITMENT'):
+                self.util.messages.enqueue(self.util.guild_config(guild)['PRIVATE_COMMAND_CHANNELS']['RECRUITMENT'], res)
 
     def killboard(self):
         self.util.logger.info('Scheduler: killboard()')
-        res = self.util.check_killboard(from_scheduler=True)
-        if res and res != 'Error!':
-            self.util.bot.send_message(self.util.config['PRIVATE_COMMAND_CHANNELS']['ACTIVITY'], res)
+        for guild, res in self.util.check_killboard(from_scheduler=True).items():
+            if res and res != 'Error!':
+                self.util.messages.enqueue(self.util.guild_config(guild)['PRIVATE_COMMAND_CHANNELS']['ACTIVITY'], res)
+
+    def _execute(self, job):
+        start = monotonic()
+        try:
+            job.func()
+        except Exception as e:
+            self.util.logger.error('Exception in scheduled job {}: {}'.format(job.name, str(e)))
+        finally:
+            job.last_duration = monotonic() - start
+            REGISTRY.observe('job_seconds', job.last_duration, job=job.name)
+            job.running = False
+
+    def stop(self):
+        with self.condition:
+            self.should_run = False
+            self.condition.notify()
+        self.executor.shutdown(wait=False)
 
     def run(self):
         while True:
-            schedule.run_pending()
-            sleep(1)
+            with self.condition:
+                while self.should_run and (not self.heap or self.heap[0][0] > monotonic()):
+                    self.condition.wait(self.heap[0][0] - monotonic() if self.heap else None)
+                if not self.should_run:
+                    return
+                deadline, _, job = heappop(self.heap)
+                job.deadline = max(deadline + job.interval, monotonic())
+                heappush(self.heap, (job.deadline, next(self.sequence), job))
+                if job.running:
+                    self.util.logger.warning('Scheduler: {} is still running, skipping this run'.format(job.name))
+                    continue
+                job.running = True
+            self.executor.submit(self._execute, job)
+
+    def describe(self):
+        """Builds a summary of every job for the !schedule command
+
+        Returns:
+            str: one line per job
+        """
+        lines = []
+        for job in self.jobs:
+            next_run = datetime.utcfromtimestamp(time() + job.deadline - monotonic()).strftime('%Y-%m-%d %H:%M')
+            duration = 'never run' if job.last_duration is None else '{:.1f}s'.format(job.last_duration)
+            status = ' (running)' if job.running else ''
+            lines.append('{}: every {}s, next run {} UTC, last took {}{}'.format(
+                job.name, job.interval, next_run, duration, status
+            ))
+        return '\n'.join(lines)
@@ -0,0 +1,117 @@
+from tempfile import NamedTemporaryFile
+from threading import Event, Lock, Thread
+from types import MappingProxyType
+import json
+import os
+
+
+def freeze(value):
+    """Makes a read-only copy of parsed JSON (dicts become mapping proxies, lists tuples)"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(e) for e in value)
+    return value
+
+
+def thaw(value):
+    """Makes a plain, mutable copy of a frozen snapshot"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(e) for e in value]
+    return value
+
+
+class ConfigManager(Thread):
+
+    def __init__(self, path, logger, data=None, interval=5):
+        """Holds config.json as an immutable snapshot and reloads it when the file changes
+
+        Readers just use ``current``; a reload or write builds a new
+        snapshot and swaps the reference, so readers never lock and never
+        see a half-applied change. Writes go through ``update``, one at a
+        time, and replace the file atomically.
+
+        Values that are looked up each time they're used (channel ids,
+        SUBSCRIBE_ROLES, GUILDS, ...) take effect on reload; sections that
+        size pools or open connections at startup still need a restart.
+
+        Args:
+            path (str): path to config.json, or None for an in-memory config
+            logger (logging.Logger): bot logger
+            data (dict): initial config; read from path if not given
+            interval (int): seconds between checks for changes to the file
+        """
+        super().__init__(name='Thread-config', daemon=True)
+        self.path = path
+        self.logger = logger
+        self.interval = interval
+        self.write_lock = Lock()
+        self.stopped = Event()
+        self.stamp = None
+        if data is None:
+            data = self._read()
+        self.current = freeze(data)
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        self.stamp = self._stat()
+        with open(self.path) as f:
+            return json.load(f)
+
+    def update(self, f):
+        """Applies a change to the config and saves it
+
+        Args:
+            f (callable): called with a mutable copy of the config to edit in place
+        """
+        with self.write_lock:
+            data = thaw(self.current)
+            f(data)
+            if self.path:
+                tmp = NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(self.path)), delete=False)
+                try:
+                    with tmp:
+                        json.dump(data, tmp, indent=4)
+                        tmp.flush()
+                        os.fsync(tmp.fileno())
+                    if os.path.exists(self.path):
+                        os.chmod(tmp.name, os.stat(self.path).st_mode & 0o777)
+                    os.replace(tmp.name, self.path)
+                except Exception:
+                    os.unlink(tmp.name)
+                    raise
+                self.stamp = self._stat()
+            self.current = freeze(data)
+
+    def reload(self):
+        """Re-reads the file if it changed since it was last read
+
+        Returns:
+            bool: True if a new snapshot was swapped in
+        """
+        with self.write_lock:
+            if self._stat() == self.stamp:
+                return False
+            try:
+                data = self._read()
+            except ValueError as e:
+                self.logger.error('Not reloading config.json, it is not valid JSON: ' + str(e))
+                return False
+            self.current = freeze(data)
+        self.logger.info('Reloaded config.json')
+        return True
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.reload()
+            except OSError as e:
+                self.logger.error('Could not check config.json for changes: ' + str(e))
+
+    def stop(self):
+        self.stopped.set()
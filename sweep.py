@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Semaphore
+from time import monotonic, sleep
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        """Simple thread-safe token bucket
+
+        Args:
+            rate (float): tokens added per second
+            capacity (int): maximum tokens held at once (burst size)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it"""
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+
+class HostLimiter:
+
+    def __init__(self, concurrency, rate, burst):
+        """Caps the number of in-flight requests and the request rate for a host
+
+        Used as a context manager around each outbound request.
+
+        Args:
+            concurrency (int): maximum simultaneous requests
+            rate (float): sustained requests per second
+            burst (int): requests allowed back-to-back before throttling
+        """
+        self.semaphore = Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        self.bucket.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.semaphore.release()
+        return False
+
+    @classmethod
+    def from_config(cls, config, defaults):
+        """Builds a limiter from a config section, falling back to defaults
+
+        Args:
+            config (dict): section such as config['SWEEP']['ESI'] (may be empty)
+            defaults (dict): values used for any missing keys
+
+        Returns:
+            HostLimiter: new limiter
+        """
+        merged = dict(defaults, **config)
+        return cls(merged['CONCURRENCY'], merged['RATE'], merged['BURST'])
+
+
+def run_sweep(func, items, workers):
+    """Runs func over items on a bounded thread pool
+
+    Args:
+        func (callable): called once per item
+        items (list): inputs
+        workers (int): pool size
+
+    Returns:
+        list: results, in the same order as items
+    """
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='sweep') as executor:
+        return list(executor.map(func, items))
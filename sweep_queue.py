@@ -0,0 +1,122 @@
+from threading import Lock
+from time import time
+import sqlite3
+
+
+class SweepQueue:
+
+    def __init__(self, path, lease, max_attempts):
+        """Leased per-main job queue shared by the bot and sweep worker processes
+
+        A worker claims a batch of mains by writing its id and a lease
+        expiry on them, renews the lease while it works and marks each main
+        done once its result is checkpointed. A lease that runs out (the
+        worker died or hung) or a released claim (the check failed) makes
+        the main claimable again, up to
+        ``max_attempts`` claims.
+
+        Every process opens the same sqlite file. It keeps sqlite's default
+        rollback journal rather than WAL, which needs shared memory on one
+        host, so workers on other hosts can reach it over a filesystem with
+        working file locks; contention is absorbed by the busy timeout.
+
+        Args:
+            path (str): path to the local sqlite file
+            lease (int): seconds a claim is valid for without a heartbeat
+            max_attempts (int): claims before a main is given up on
+        """
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS sweep_jobs (name TEXT PRIMARY KEY, local_only INTEGER NOT NULL, '
+            'owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, done INTEGER NOT NULL DEFAULT 0)'
+        )
+
+    def enqueue(self, names, local_only, reset=False):
+        """Adds mains to the queue
+
+        Args:
+            names (list): main character names
+            local_only (bool): whether workers should trust local data instead of querying zKB
+            reset (bool): drop every existing job first (a new sweep is starting)
+        """
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            if reset:
+                self.connection.execute('DELETE FROM sweep_jobs')
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO sweep_jobs (name, local_only) VALUES (?, ?)', [(name, int(local_only)) for name in names]
+            )
+            self.connection.execute('COMMIT')
+
+    def claim(self, owner, limit):
+        """Leases up to ``limit`` mains that are unclaimed or whose lease ran out
+
+        Args:
+            owner (str): worker id
+            limit (int): maximum mains to claim
+
+        Returns:
+            tuple: (list of (name, local_only) claims, number of mains just given up on)
+        """
+        now = time()
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            given_up = self.connection.execute(
+                'UPDATE sweep_jobs SET done = 1 WHERE done = 0 AND lease_expires < ? AND attempts >= ?', (now, self.max_attempts)
+            ).rowcount
+            rows = self.connection.execute(
+                'SELECT name, local_only FROM sweep_jobs WHERE done = 0 AND (lease_expires IS NULL OR lease_expires < ?) LIMIT ?',
+                (now, limit)
+            ).fetchall()
+            self.connection.executemany(
+                'UPDATE sweep_jobs SET owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE name = ?',
+                [(owner, now + self.lease, row[0]) for row in rows]
+            )
+            self.connection.execute('COMMIT')
+        return [(name, bool(local_only)) for name, local_only in rows], given_up
+
+    def heartbeat(self, owner):
+        """Renews every unfinished lease a worker holds
+
+        Args:
+            owner (str): worker id
+        """
+        with self.lock:
+            self.connection.execute(
+                'UPDATE sweep_jobs SET lease_expires = ? WHERE owner = ? AND done = 0', (time() + self.lease, owner)
+            )
+
+    def complete(self, owner, name):
+        """Marks a main done, if the worker still holds its lease
+
+        Args:
+            owner (str): worker id
+            name (str): main character name
+        """
+        with self.lock:
+            self.connection.execute('UPDATE sweep_jobs SET done = 1 WHERE name = ? AND owner = ?', (name, owner))
+
+    def release(self, owner, name, delay):
+        """Gives a claimed main back so it can be retried after a delay
+
+        Args:
+            owner (str): worker id
+            name (str): main character name
+            delay (float): seconds before the main can be claimed again
+        """
+        with self.lock:
+            self.connection.execute(
+                'UPDATE sweep_jobs SET owner = NULL, lease_expires = ? WHERE name = ? AND owner = ?', (time() + delay, name, owner)
+            )
+
+    def remaining(self):
+        """Gets the number of mains not done yet
+
+        Returns:
+            int: unfinished jobs
+        """
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM sweep_jobs WHERE done = 0').fetchone()[0]
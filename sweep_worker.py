@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Standalone killboard sweep worker
+
+Claims mains from the shared sweep queue, checks them against ESI and zKB
+and writes the results back for the bot to report on. Needs
+SWEEP.DISTRIBUTED.ENABLED and the same config.json (AUTH_DATABASE and
+LOCAL_DATABASE in particular) as the bot.
+
+    $ python sweep_worker.py
+"""
+from os import getpid
+from socket import gethostname
+import json
+import logging
+import sys
+
+from util import ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID, Util
+
+
+def main():
+    with open('config.json') as f:
+        config = json.load(f)
+
+    logger = logging.getLogger('getin-auth-discord-worker')
+    logger.setLevel(config['LOGGING']['LEVEL']['ALL'])
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(style='{', fmt='{asctime} [{levelname}] {message}', datefmt='%Y-%m-%d %H:%M:%S'))
+    handler.setLevel(config['LOGGING']['LEVEL']['CONSOLE'])
+    logger.addHandler(handler)
+
+    util = Util(None, config, logger, ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID)
+    if not util.sweep_queue:
+        logger.error('SWEEP.DISTRIBUTED.ENABLED is not set in config.json')
+        sys.exit(1)
+    owner = '{}-{}'.format(gethostname(), getpid())
+    logger.info('Sweep worker {} waiting for jobs'.format(owner))
+    util.work_sweep_queue(owner, forever=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler
+from threading import Lock, Thread
+from time import sleep, time
+import json
+import logging
+import random
+
+import pytest
+
+import benchmark
+from metrics import ThreadingHTTPServer
+from redisq import KillFeed
+from util import ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID, Util
+
+
+class FeedStandIn:
+
+    def __init__(self, packages):
+        """Local stand-in for RedisQ's listen.php
+
+        Hands out the given packages in order, then ``{"package": null}``
+        like the real feed does when nothing new has happened.
+
+        Args:
+            packages (list): packages to serve
+        """
+        self.lock = Lock()
+        self.packages = list(packages)
+        self.polls = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if not self.path.startswith('/listen.php'):
+                    self.send_error(404)
+                    return
+                with stand_in.lock:
+                    stand_in.polls += 1
+                    package = stand_in.packages.pop(0) if stand_in.packages else None
+                data = json.dumps({'package': package}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/listen.php'.format(self.server.server_port)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def package(kill_id, attackers, killmail_time=None):
+    killmail_time = killmail_time or datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+    return {
+        'killID': kill_id,
+        'killmail': {
+            'killmail_time': killmail_time,
+            'attackers': [{'character_id': e} if e else {} for e in attackers],
+            'victim': {'character_id': 1}
+        }
+    }
+
+
+@pytest.fixture
+def stand_in():
+    server = benchmark.StandIn(0, 0)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def util(tmp_path, stand_in, monkeypatch):
+    random.seed(0)
+    benchmark.build_database(str(tmp_path / 'data.db'), 6, 1)
+    config = {
+        'URL_ROOT': stand_in.url + '/',
+        'API_SECRET': 'test',
+        'ZKILL_USER_AGENT': 'test',
+        'AUTH_DATABASE': str(tmp_path / 'data.db'),
+        'LOCAL_DATABASE': str(tmp_path / 'local.db'),
+        'PRIVATE_COMMAND_CHANNELS': {'RECRUITMENT': '1', 'ACTIVITY': '2', 'ACTIVITY_MODERATION': '3'},
+        'HTTP': {'HOST_OVERRIDES': {'esi.tech.ccp.is': stand_in.url, 'zkillboard.com': stand_in.url}},
+        'SWEEP': {'RETRY_PASSES': 0}
+    }
+    util = Util(None, config, logging.getLogger('test'), ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID)
+    monkeypatch.setattr(util.messages, 'enqueue', lambda channel, message: None)
+    monkeypatch.setattr(util.messages, 'enqueue_many', lambda channel, messages: None)
+    return util
+
+
+def consume(feed, stand_in, timeout=10):
+    feed.start()
+    deadline = time() + timeout
+    while stand_in.packages and time() < deadline:
+        sleep(0.05)
+    # one more poll, so the last package has been handled
+    polls = stand_in.polls
+    while stand_in.polls == polls and time() < deadline:
+        sleep(0.05)
+    feed.stop()
+
+
+def test_handle_credits_only_member_attackers(util):
+    member, alt, outsider = benchmark.MAIN_ID_BASE + 1, benchmark.ALT_ID_BASE + 2, 12345
+    feed_server = FeedStandIn([
+        package(1, [member, outsider, None]),
+        package(2, [outsider]),
+        package(3, [alt], '2020-01-01T00:00:00Z')
+    ])
+    try:
+        consume(KillFeed(util, {'URL': feed_server.url, 'TTW': 1}), feed_server)
+    finally:
+        feed_server.stop()
+
+    assert util.activity.last_kill([member]) > time() - 60
+    assert util.activity.last_kill([alt]) == Util.killmail_timestamp({'killmail_time': '2020-01-01T00:00:00Z'})
+    assert util.activity.last_kill([outsider]) is None
+    assert util.activity.feed_state() is not None
+
+
+def test_mark_polled_restarts_window_after_gap(util):
+    feed = KillFeed(util, {'MAX_GAP': 300})
+    now = time()
+
+    util.activity.set_feed_state(now - 3600, now - 100)
+    feed.mark_polled()
+    started, last_seen = util.activity.feed_state()
+    assert started == now - 3600
+    assert last_seen >= now
+
+    util.activity.set_feed_state(now - 3600, now - 301)
+    feed.mark_polled()
+    started, last_seen = util.activity.feed_state()
+    assert started >= now
+    assert started == last_seen
+
+
+def test_covers_gates_local_only(util, stand_in):
+    window = ACTIVITY_TIME_DAYS * 86400
+    util.kill_feed = KillFeed(util, {'MAX_GAP': 300})
+    active = 'Main {:05d}'.format(1)
+    util.activity.record([benchmark.ALT_ID_BASE + 1], time() - 3600)
+
+    util.activity.set_feed_state(time() - window - 60, time())
+    assert util.kill_feed.covers(window)
+    stand_in.reset()
+    report = util.check_killboard()['']
+    requests = stand_in.reset()
+    assert 'zkb_characterid' not in requests
+    assert 'esi_affiliation' not in requests
+    # corp histories that were never cached are fetched once, one per main
+    assert requests.get('esi_corporationhistory') == len(util.members.roster())
+    assert active not in report
+    assert 'Main 00000' in report
+
+    # with every corp history cached, a local run makes no network calls at all
+    assert util.check_killboard()[''] == report
+    assert stand_in.reset() == {}
+
+    # a gap longer than MAX_GAP means the ledger may have missed kills
+    util.activity.set_feed_state(time() - window - 60, time() - 301)
+    assert not util.kill_feed.covers(window)
+    util.check_killboard()
+    assert stand_in.reset().get('zkb_characterid', 0) > 0
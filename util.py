@@ -1,31 +1,216 @@
-from datetime import datetime, timedelta
-import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from os import getpid
+from socket import gethostname
+from threading import Event, Lock, Thread
+from time import monotonic, sleep, time
 import re
-import json
 
-import requests
+from activity import ActivityLedger
+from apps import AppTracker
+from checkpoint import SweepCheckpoint
+from esi_cache import CorpHistoryCache, get_affiliations
+from gateway import GuildCache
+from history import ActivityHistory
+from http_client import HttpClient
+from metrics import REGISTRY
+from messages import MessageQueue, pack_lines
+from roster import AuthDatabase, MemberIndex
+from settings import ConfigManager
+from sweep import HostLimiter, run_sweep
+from sweep_queue import SweepQueue
+from whitelist import WhitelistStore
+
+
+ACTIVITY_TIME_DAYS = 30  # (roughly) 1 month
+WORMBRO_CORP_ID = 98134538
+SWEEP_DEFAULTS = {
+    'WORKERS': 8,
+    'SHARDS': 1,
+    'RESUME_MAX_AGE': 86400,
+    'RETRY_PASSES': 2,
+    'RETRY_DELAY': 60,
+    'DISTRIBUTED': {'ENABLED': False, 'LEASE': 120, 'BATCH': 20, 'POLL': 5, 'MAX_ATTEMPTS': 5},
+    'ESI': {'CONCURRENCY': 8, 'RATE': 20, 'BURST': 20},
+    'ZKB': {'CONCURRENCY': 2, 'RATE': 2, 'BURST': 2}
+}
+GUILD_DEFAULTS = {
+    'PRIVATE_COMMAND_CHANNELS': {'RECRUITMENT': '', 'ACTIVITY': '', 'ACTIVITY_MODERATION': ''},
+    'SUBSCRIBE_WHITELISTED_CHANNELS': []
+}
+ACTIVITY_LEDGER_MAX_AGE = 21600  # 6 hours
+PROFILE_CACHE_TTL = 300  # 5 minutes
 
 
 class Util:
 
     def __init__(self, bot, config, logger, ACTIVITY_TIME_DAYS, WORMBRO_CORP_ID):
         self.bot = bot
-        self.config = config
+        self.settings = config if isinstance(config, ConfigManager) else ConfigManager(None, logger, config)
+        config = self.config
         self.logger = logger
         self.ACTIVITY_TIME_DAYS = ACTIVITY_TIME_DAYS
         self.WORMBRO_CORP_ID = WORMBRO_CORP_ID
+        self.http = HttpClient(logger, config.get('HTTP'))
+        self.messages = MessageQueue(bot, self.http, logger)
+        # sweep worker processes run without a gateway connection
+        self.guilds = GuildCache(bot, self.http) if bot else None
+        self.auth_db = AuthDatabase(config.get('AUTH_DATABASE', '../getin-auth/data.db'))
+        self.members = MemberIndex(self.auth_db)
+        self.kill_feed = None
+        self.activity_whitelist = WhitelistStore(config.get('LOCAL_DATABASE', 'local.db'), ACTIVITY_TIME_DAYS * 86400)
+        if config.get('ACTIVITY_WHITELIST'):
+            imported = self.activity_whitelist.migrate(config['ACTIVITY_WHITELIST'], ACTIVITY_TIME_DAYS)
+            self.logger.info('Migrated {} activity whitelist entries out of config.json'.format(imported))
+            self.settings.update(lambda data: data.pop('ACTIVITY_WHITELIST', None))
+        sweep_config = config.get('SWEEP', {})
+        self.sweep_workers = sweep_config.get('WORKERS', SWEEP_DEFAULTS['WORKERS'])
+        self.sweep_resume_max_age = sweep_config.get('RESUME_MAX_AGE', SWEEP_DEFAULTS['RESUME_MAX_AGE'])
+        self.sweep_retry_passes = sweep_config.get('RETRY_PASSES', SWEEP_DEFAULTS['RETRY_PASSES'])
+        self.sweep_retry_delay = sweep_config.get('RETRY_DELAY', SWEEP_DEFAULTS['RETRY_DELAY'])
+        self.sweep_checkpoint = SweepCheckpoint(
+            config.get('LOCAL_DATABASE', 'local.db'), sweep_config.get('SHARDS', SWEEP_DEFAULTS['SHARDS'])
+        )
+        self.sweep_distributed = dict(SWEEP_DEFAULTS['DISTRIBUTED'], **sweep_config.get('DISTRIBUTED', {}))
+        self.sweep_queue = None
+        if self.sweep_distributed['ENABLED']:
+            self.sweep_queue = SweepQueue(
+                config.get('LOCAL_DATABASE', 'local.db'), self.sweep_distributed['LEASE'], self.sweep_distributed['MAX_ATTEMPTS']
+            )
+        self.esi_limiter = HostLimiter.from_config(sweep_config.get('ESI', {}), SWEEP_DEFAULTS['ESI'])
+        self.zkb_limiter = HostLimiter.from_config(sweep_config.get('ZKB', {}), SWEEP_DEFAULTS['ZKB'])
+        self.corp_history = CorpHistoryCache(config.get('LOCAL_DATABASE', 'local.db'), logger, self.http, self.esi_limiter)
+        self.activity = ActivityLedger(config.get('LOCAL_DATABASE', 'local.db'))
+        self.apps = AppTracker(config.get('LOCAL_DATABASE', 'local.db'))
+        self.history = ActivityHistory(config.get('LOCAL_DATABASE', 'local.db'))
+        self.lookups = ThreadPoolExecutor(max_workers=4, thread_name_prefix='lookup')
+        self.profile_lock = Lock()
+        self.profile_cache = {}
+        self.guild_configs = (None, {})
+
+    def get_apps(self):
+        """Gets the pending applications from the server
+
+        Revalidates the previous response with If-None-Match and
+        If-Modified-Since, so an unchanged list costs a 304.
+
+        Returns:
+            list: application names
+        """
+        headers = {'REST-SECRET': self.config['API_SECRET']}
+        cached = self.apps.cached()
+        if cached and cached[0]:
+            headers['If-None-Match'] = cached[0]
+        if cached and cached[1]:
+            headers['If-Modified-Since'] = cached[1]
+        r = self.http.get(self.config['URL_ROOT'] + 'apps', headers=headers, verify=False)
+        if r.status_code == 304 and cached:
+            return cached[2]
+        if not r.status_code == 200:
+            raise Exception('Status code was {}, not 200'.format(r.status_code))
+        js = r.json()
+        self.apps.store(r.headers.get('ETag'), r.headers.get('Last-Modified'), js)
+        return js
+
+    def guild_key(self, guild_id):
+        """Gets the key a guild's settings and whitelist are stored under
+
+        Args:
+            guild_id (str): guild snowflake id, or None for direct messages
+
+        Returns:
+            str: the guild id if it has a GUILDS entry, otherwise '' (the top-level settings)
+        """
+        return str(guild_id) if guild_id and str(guild_id) in self.config.get('GUILDS', {}) else ''
+
+    def guild_config(self, guild_id):
+        """Gets the settings that apply to a guild
+
+        A guild listed under GUILDS uses its own SUBSCRIBE_ROLES, channel ids
+        and so on, falling back to the top-level value for anything it
+        doesn't set (except channel ids, which never carry over). Any other
+        guild uses the top-level settings.
+
+        Args:
+            guild_id (str): guild snowflake id, or a key from guild_key
+
+        Returns:
+            dict: config view for the guild
+        """
+        config = self.config
+        snapshot, cache = self.guild_configs
+        if snapshot is not config:
+            cache = {}
+            self.guild_configs = (config, cache)
+        key = self.guild_key(guild_id)
+        merged = cache.get(key)
+        if merged is None:
+            merged = config
+            if key:
+                merged = dict(config, **GUILD_DEFAULTS)
+                merged.update(config['GUILDS'][key])
+            cache[key] = merged
+        return merged
+
+    def report_guilds(self, channel):
+        """Gets the guilds that have a given private channel configured
+
+        Args:
+            channel (str): PRIVATE_COMMAND_CHANNELS key, like 'ACTIVITY'
+
+        Returns:
+            list: guild keys
+        """
+        keys = [''] + list(self.config.get('GUILDS', {}))
+        return [key for key in keys if self.guild_config(key)['PRIVATE_COMMAND_CHANNELS'].get(channel)]
+
+    @property
+    def config(self):
+        """The current config snapshot (read-only; change it through ``settings.update``)"""
+        return self.settings.current
+
+    def prewarm(self, timeout=60):
+        """Starts warming the roster, guild roles and outbound connections in the background
+
+        Args:
+            timeout (float): seconds the guild warm-up waits for READY
+
+        Returns:
+            list: one future per warm-up task
+        """
+        tasks = {
+            'roster': self.members.roster,
+            'guilds': lambda: self.guilds.warm(timeout),
+            'auth': lambda: self.http.warm(self.config['URL_ROOT'], verify=False),
+            'esi': lambda: self.http.warm('https://esi.tech.ccp.is/'),
+            'zkb': lambda: self.http.warm('https://zkillboard.com/')
+        }
+
+        def run(name, task):
+            try:
+                with REGISTRY.timed('prewarm_seconds', part=name):
+                    task()
+            except Exception as e:
+                self.logger.error('Exception warming {}: {}'.format(name, str(e)))
+
+        pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='prewarm')
+        futures = [pool.submit(run, name, task) for name, task in tasks.items()]
+        pool.shutdown(wait=False)
+        return futures
 
     def check_apps(self, from_scheduler=False):
         """Makes an API request to the server to check applications
 
+        From the scheduler only applications that haven't been announced
+        yet are reported; the !apps command lists every pending one.
+
         Returns:
             str: message to post in chat
         """
         try:
-            r = requests.get(self.config['URL_ROOT'] + 'apps', headers={'REST-SECRET': self.config['API_SECRET']}, verify=False)
-            if not r.status_code == 200:
-                raise Exception('Status code was {}, not 200'.format(r.status_code))
-            js = r.json()
+            js = self.get_apps()
+            if from_scheduler:
+                js = self.apps.announce(js)
             if js:
                 return 'New applications: ' + ', '.join(js)
             if from_scheduler:
@@ -43,249 +228,440 @@ class Util:
         """
         return (datetime.utcnow() - timedelta(days=self.ACTIVITY_TIME_DAYS)).strftime('%Y%m%d%H') + '00'
 
-    def get_database_mains(self):
-        """Gets the main characters from the database
+    def is_main_valid(self, character):
+        """Checks if the character name is valid
+
+        Args:
+            character (str): character name
 
         Returns:
-            list: main character names
+            boolean: is main valid?
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute('SELECT DISTINCT main FROM member WHERE status = "Accepted"')
-        data = cursor.fetchall()
-        connection.close()
-        return [e[0] for e in data]
+        return bool(self.members.by_name(character))
 
-    def get_database_alts_id(self, main):
-        """Gets the main character's alts from the database
+    def get_character_main(self, character):
+        """Gets the main character from the database
 
         Args:
             main (str): main character name
 
         Returns:
-            list: alt character names
+            str: main character name
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute('SELECT character_id FROM member WHERE main=? AND status = "Accepted" AND character_id != "NULL"', (main, ))
-        data = cursor.fetchall()
-        connection.close()
-        return [e[0] for e in data]
+        return self.members.by_name(character)[0].main
 
-    def get_database_alts_name(self, main):
-        """Gets the main character's alts from the database
+    def did_you_mean(self, character):
+        """Builds a suggestion string for a character name that wasn't found
 
         Args:
-            main (str): main character name
+            character (str): character name as typed
 
         Returns:
-            list: alt character names
+            str: suggestion text, or an empty string if nothing is close
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute('SELECT character_name FROM member WHERE main=? AND status = "Accepted" AND character_id != "NULL"', (main, ))
-        data = cursor.fetchall()
-        connection.close()
-        return [e[0] for e in data]
+        suggestions = self.members.search(character)
+        if not suggestions:
+            return ''
+        return ' Did you mean: ' + ', '.join(suggestions) + '?'
 
-    def get_character_id(self, main):
-        """Gets a character id from the database
+    def convert_to_zkill_date(self, esiDate):
+        """Converts EvE ESI date to EvE Zkillboard date
 
         Args:
-            main (str): character name
+            esiDate (str): date in ESI format
 
         Returns:
-            list: character id
+            string: zkillboard date format
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute("SELECT character_id FROM member WHERE character_name=? AND character_id != 'NULL'", (main, ))
-        data = cursor.fetchall()
-        connection.close()
-        return [e[0] for e in data]
+        zkillDate = re.sub(r'[^0-9]', '', esiDate[:-4])
+        return zkillDate
 
-    def is_main_valid(self, character):
-        """Checks if the character name is valid
+    @staticmethod
+    def killmail_timestamp(killmail):
+        """Gets the time of a zKB killmail
 
         Args:
-            character (str): character name
+            killmail (dict): killmail from the zKB API
 
         Returns:
-            boolean: is main valid?
+            float: unix timestamp
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute("SELECT character_name FROM member WHERE lower(character_name) = ?", (character.lower(), ))
-        data = cursor.fetchall()
-        entries = True
-        if not data:
-            entries = False
+        return datetime.strptime(killmail['killmail_time'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp()
 
-        connection.close()
-        return entries
+    def record_kill(self, killmail, character_ids):
+        """Records a killmail in the activity ledger for the characters involved in it
 
-    def get_character_main(self, character):
-        """Gets the main character from the database
+        Args:
+            killmail (dict): killmail from the zKB API
+            character_ids (list): character ids the killmail was requested for
+        """
+        involved = [e.get('character_id') for e in killmail.get('attackers', [])]
+        involved.append(killmail.get('victim', {}).get('character_id'))
+        matched = [e for e in character_ids if e and int(e) in involved]
+        if matched:
+            self.activity.record(matched, Util.killmail_timestamp(killmail))
+
+    def check_main_activity(self, name, entry, local_only=False):
+        """Checks a single main's corp tenure and recent killboard activity
+
+        Safe to call from sweep worker threads; outbound requests are
+        throttled through the per-host limiters. Raises if ESI or zKB
+        can't be queried, so the caller can retry the main later.
 
         Args:
-            main (str): main character name
+            name (str): main character name
+            entry (roster.RosterEntry): the main's roster entry
+            local_only (bool): trust the activity ledger and cached corp histories instead of querying zKB;
+                ESI is still asked once for a main whose corp history was never cached
 
         Returns:
-            str: main character name
+            bool: True if the main has been in corp for a month and has no recent kills
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute("SELECT main FROM member WHERE lower(character_name) = ?", (character.lower(), ))
-        data = cursor.fetchone()
-        connection.close()
-        return data[0]
+        # check if person has been in corp for a month
+        if entry.main_id is None:
+            self.logger.warning("No character ID found for " + name)
+            return False
+        corpHistoryJSON = self.corp_history.get(entry.main_id, allow_stale=local_only)
+        hasBeenInCorp = False
+        for j in corpHistoryJSON:
+            if j['corporation_id'] == self.WORMBRO_CORP_ID:
+                if self.convert_to_zkill_date(j['start_date']) < self.get_last_month():
+                    hasBeenInCorp = True
+                    break
+        if not hasBeenInCorp:
+            self.logger.info(name + ' hasn\'t been in corp for a month! Continuing ...')
+            return False
+
+        alts = sorted(entry.alt_ids, key=int)
+        last_kill = self.activity.last_kill([e for e in alts if e])
+        if last_kill and last_kill > time() - self.ACTIVITY_TIME_DAYS * 86400:
+            self.logger.debug(name + ' has a recent kill in the activity ledger')
+            return False
+        request_url = 'https://zkillboard.com/api/characterID/'
+        found = False
+        for i in range(len(alts)):
+            if not alts[i]:
+                self.logger.warning('No valid IDs found for character linked to {}'.format(name))
+                continue
+            if i > 0:
+                request_url += ','
+            request_url += str(alts[i])
+            found = True
+        if not found:
+            self.logger.warning('No valid IDs for found character linked to {}'.format(name))
+            return False
+        if local_only:
+            self.logger.info('{} has no kills in the activity ledger, adding to list'.format(name))
+            return True
+        request_url += '/startTime/{}/limit/1/'.format(self.get_last_month())
+        self.logger.info('Making killboard request to {}'.format(request_url))
+        r = self.http.get(request_url, limiter=self.zkb_limiter, headers={
+            'Accept-Encoding': 'gzip',
+            'User-Agent': 'Maintainer: ' + self.config['ZKILL_USER_AGENT']
+        })
+        if r.status_code != 200:
+            raise Exception('Status code was {}, not 200'.format(r.status_code))
+        data = r.json()
+        if not data:
+            self.logger.info('{} has no kills, adding to list'.format(name))
+            return True
+        self.record_kill(data[0], alts)
+        return False
 
-    def convert_to_zkill_date(self, esiDate):
-        """Converts EvE ESI date to EvE Zkillboard date
+    def filter_current_members(self, mains, roster):
+        """Drops mains that are not currently in corp, using one bulk ESI lookup
+
+        Mains without a character ID are kept so the per-main check can log
+        them. If the lookup fails, every main is kept.
 
         Args:
-            esiDate (str): date in ESI format
+            mains (list): main character names
+            roster (dict): main name -> roster.RosterEntry
 
         Returns:
-            string: zkillboard date format
+            list: mains still worth a corporation history lookup
         """
-        zkillDate = re.sub(r'[^0-9]', '', esiDate[:-4])
-        return zkillDate
+        ids = [roster[name].main_id for name in mains if roster[name].main_id]
+        try:
+            affiliations = get_affiliations(self.http, self.esi_limiter, ids)
+        except Exception as e:
+            self.logger.error('Exception getting affiliations, skipping prefilter: ' + str(e))
+            return mains
+        current = []
+        for name in mains:
+            main_id = roster[name].main_id
+            if main_id and affiliations.get(int(main_id), self.WORMBRO_CORP_ID) != self.WORMBRO_CORP_ID:
+                self.logger.info(name + ' is not currently in corp! Continuing ...')
+                continue
+            current.append(name)
+        return current
 
     def check_killboard(self, from_scheduler=False):
         """Makes API calls to zKB to check killboard activity
 
+        Mains whitelisted in every reporting guild are skipped; the rest are checked
+        concurrently on a bounded thread pool. Each result is checkpointed,
+        so an interrupted sweep resumes instead of starting over. When the
+        sweep is split into shards, each call checks one shard and the
+        report is built from the latest result of every main once the last
+        shard is done. Each guild gets its own report, minus the mains on
+        that guild's whitelist.
+
+        Mains whose check fails (an ESI or zKB error) are retried in up to
+        SWEEP.RETRY_PASSES deferred passes, SWEEP.RETRY_DELAY seconds
+        apart. Any main without a result from the current pass (in any
+        shard) is listed in the report rather than counted as active.
+
         Returns:
-            str: message to post in chat
+            dict: guild key -> message to post in that guild's ACTIVITY channel
         """
         self.logger.info('Starting killboard check ...')
-        noKillsList = []
-        mains = self.get_database_mains()
+        guilds = self.report_guilds('ACTIVITY')
+        roster = self.members.roster()
+        mains = list(roster)
         if not mains:
             message = 'No mains in the database!'
             self.logger.warning(message)
             if from_scheduler:
-                return None
-            return message
-
-        activity_whitelist = [e['NAME'] for e in self.config['ACTIVITY_WHITELIST']]
-        for index, name in enumerate(mains):
-            if name in activity_whitelist:
-                for index in range(len(self.config['ACTIVITY_WHITELIST'])):
-                    char = self.config['ACTIVITY_WHITELIST'][index]
-                    if name == char["NAME"]:
-                        if char['EXPIRY TIME'] < self.ACTIVITY_TIME_DAYS * -1:
-                            # permanent
-                            self.logger.info(name + ' is permanently on the whitelist! Continuing ...')
-                        else:
-                            """
-                            Not permanent
-                            Remove from whitelist
-                            """
-                            if char['EXPIRY TIME'] - 1 < self.ACTIVITY_TIME_DAYS * -1:
-                                self.config['ACTIVITY_WHITELIST'].pop(index)
-                                self.logger.info(name + ' has been removed from the whitelist! Continuing ...')
-                            else:
-                                self.config['ACTIVITY_WHITELIST'][index]['EXPIRY TIME'] -= 1
-                                self.logger.info(name + ' has gotten 1 day reduced from his / her whitelist time, but remains on it! Continuing ...')
-                        break
+                return {}
+            return {guild: message for guild in guilds}
 
+        candidates = []
+        for name in mains:
+            if guilds and all(self.activity_whitelist.get(name, guild) for guild in guilds):
+                self.logger.info(name + ' is on the whitelist! Continuing ...')
                 continue
+            candidates.append(name)
+
+        shard, done = self.sweep_checkpoint.begin(self.sweep_resume_max_age)
+        to_check = [name for name in candidates if self.sweep_checkpoint.shard_of(name) == shard and name not in done]
+        if done:
+            self.logger.info('Resuming killboard check, {} mains already done'.format(len(done)))
+        if self.sweep_checkpoint.shards > 1:
+            self.logger.info('Checking shard {} of {} ({} mains)'.format(shard + 1, self.sweep_checkpoint.shards, len(to_check)))
+
+        local_only = self.kill_feed is not None and self.kill_feed.covers(self.ACTIVITY_TIME_DAYS * 86400)
+        if local_only:
+            self.logger.info('Kill feed covers the activity window, using local data only')
+        else:
+            current = self.filter_current_members(to_check, roster)
+            self.sweep_checkpoint.record({name: False for name in set(to_check) - set(current)})
+            to_check = current
 
-            # check if person has been in corp for a month
-            charID = self.get_character_id(name)
-            if len(charID) <= 0:
-                self.logger.warning("No character ID found for " + name)
-                continue
-            corpHistoryURL = 'https://esi.tech.ccp.is/latest/characters/' + str(charID[0]) + '/corporationhistory/?datasource=tranquility'
-            corpHistory = requests.get(corpHistoryURL)
-            corpHistoryJSON = corpHistory.json()
-            hasBeenInCorp = False
-            for j in corpHistoryJSON:
-                if j['corporation_id'] == self.WORMBRO_CORP_ID:
-                    if self.convert_to_zkill_date(j['start_date']) < self.get_last_month():
-                        hasBeenInCorp = True
-                        break
-            if not hasBeenInCorp:
-                self.logger.info(name + ' hasn\'t been in corp for a month! Continuing ...')
-                continue
+        if self.sweep_queue:
+            self.sweep_queue.enqueue(to_check, local_only, reset=not done)
+            self.work_sweep_queue('{}-{}'.format(gethostname(), getpid()))
+        else:
+            failed = []
+
+            def check(name):
+                try:
+                    no_kills = self.check_main_activity(name, roster[name], local_only)
+                    self.sweep_checkpoint.record({name: no_kills})
+                except Exception as e:
+                    self.logger.error('Exception checking {}, deferring it: {}'.format(name, str(e)))
+                    failed.append(name)
+            run_sweep(check, to_check, self.sweep_workers)
+            for attempt in range(self.sweep_retry_passes):
+                if not failed:
+                    break
+                retry = sorted(failed)
+                del failed[:]
+                self.logger.info('Retrying {} mains in {}s (pass {} of {})'.format(
+                    len(retry), self.sweep_retry_delay, attempt + 1, self.sweep_retry_passes
+                ))
+                sleep(self.sweep_retry_delay)
+                run_sweep(check, retry, self.sweep_workers)
+        checked = self.sweep_checkpoint.checked()
+        missed = sorted(name for name in to_check if name not in checked)
+        if missed:
+            self.logger.error('Could not check {} mains: {}'.format(len(missed), ', '.join(missed)))
+        if not self.sweep_checkpoint.finish():
+            return {}
+
+        results = self.sweep_checkpoint.results(candidates)
+        unchecked = [name for name in candidates if name not in results]
+        self.history.record(results)
+        inactive = [name for name in candidates if results.get(name)]
+        return {
+            guild: self.activity_report(
+                guild,
+                [name for name in inactive if not self.activity_whitelist.get(name, guild)],
+                from_scheduler,
+                [name for name in unchecked if not self.activity_whitelist.get(name, guild)]
+            )
+            for guild in guilds
+        }
 
-            alts = self.get_database_alts_id(name)
-            alts.sort(key=int)
-            request_url = 'https://zkillboard.com/api/characterID/'
-            found = False
-            for i in range(len(alts)):
-                if not alts[i]:
-                    self.logger.warning('No valid IDs found for character linked to {}'.format(name))
-                    continue
-                if i > 0:
-                    request_url += ','
-                request_url += str(alts[i])
-                found = True
-            if not found:
-                self.logger.warning('No valid IDs for found character linked to {}'.format(name))
-                continue
-            request_url += '/startTime/{}/limit/1/'.format(self.get_last_month())
-            self.logger.info('Making killboard request to {}'.format(request_url))
-            r = requests.get(request_url, headers={
-                'Accept-Encoding': 'gzip',
-                'User-Agent': 'Maintainer: ' + self.config['ZKILL_USER_AGENT']
-            })
-            if r.status_code != 200:
-                self.logger.error('Got status code {} from {}'.format(r.status_code, request_url))
-                continue
-            data = r.json()
-            if not data:
-                self.logger.info('{} has no kills, adding to list'.format(name))
-                noKillsList.append(name)
-        if not noKillsList:
+    def work_sweep_queue(self, owner, forever=False):
+        """Claims and checks mains from the distributed sweep queue
+
+        Leases are renewed in the background while a batch is worked on.
+        A main whose check fails is released, so it is retried by whichever
+        worker claims it next.
+
+        Args:
+            owner (str): worker id, unique per process
+            forever (bool): keep polling for work instead of returning once every job is done
+        """
+        settings = self.sweep_distributed
+        stopped = Event()
+
+        def heartbeat():
+            while not stopped.wait(settings['LEASE'] / 3):
+                try:
+                    self.sweep_queue.heartbeat(owner)
+                except Exception as e:
+                    self.logger.error('Exception renewing sweep leases: ' + str(e))
+        Thread(target=heartbeat, name='Thread-sweep-heartbeat', daemon=True).start()
+
+        def check(job):
+            name, local_only = job
+            entry = self.members.roster().get(name)
+            try:
+                no_kills = self.check_main_activity(name, entry, local_only) if entry else False
+                self.sweep_checkpoint.record({name: no_kills})
+                self.sweep_queue.complete(owner, name)
+            except Exception as e:
+                self.logger.error('Exception checking {}, releasing it for a retry: {}'.format(name, str(e)))
+                try:
+                    self.sweep_queue.release(owner, name, settings['POLL'])
+                except Exception as e:
+                    # the lease runs out on its own and the job is claimed again
+                    self.logger.error('Exception releasing {}: {}'.format(name, str(e)))
+
+        try:
+            while True:
+                try:
+                    jobs, given_up = self.sweep_queue.claim(owner, settings['BATCH'])
+                    if given_up:
+                        self.logger.warning('Gave up on {} mains after {} attempts'.format(given_up, settings['MAX_ATTEMPTS']))
+                    if jobs:
+                        run_sweep(check, jobs, self.sweep_workers)
+                        continue
+                    if not forever and not self.sweep_queue.remaining():
+                        return
+                except Exception as e:
+                    self.logger.error('Exception working the sweep queue: ' + str(e))
+                sleep(settings['POLL'])
+        finally:
+            stopped.set()
+
+    def activity_report(self, guild, noKillsList, from_scheduler=False, unchecked=()):
+        """Posts a guild's inactivity report
+
+        Everything but the last chunk is queued for the guild's ACTIVITY
+        channel; the last chunk is returned for the caller to send. With
+        ACTIVITY_REPORT.MODE set to "delta" only the changes since the
+        guild's previous report are posted. Mains that couldn't be checked
+        get a section of their own in either mode.
+
+        Args:
+            guild (str): guild key
+            noKillsList (list): inactive mains not whitelisted in the guild
+            from_scheduler (bool): return None instead of a message when there's nothing to report
+            unchecked (list): mains whose check kept failing
+
+        Returns:
+            str: message to post in chat
+        """
+        roster = self.members.roster()
+        whitelisted = [name for name in roster if self.activity_whitelist.get(name, guild)]
+        previous = self.history.last_report(guild)
+        state = dict({name: 'whitelisted' for name in whitelisted}, **{name: 'inactive' for name in noKillsList})
+        # an unchecked main keeps whatever status it was last reported with
+        state.update({name: previous[name] for name in unchecked if name in previous and name not in state})
+        self.history.set_last_report(guild, state)
+        channel = self.guild_config(guild)['PRIVATE_COMMAND_CHANNELS']['ACTIVITY']
+
+        if self.guild_config(guild).get('ACTIVITY_REPORT', {}).get('MODE') == 'delta':
+            sections = [
+                ('Newly inactive', [name for name in noKillsList if previous.get(name) != 'inactive']),
+                ('Back to active', [
+                    name for name, status in previous.items() if status == 'inactive' and name not in state and name in roster
+                ]),
+                ('Whitelist expired', [name for name, status in previous.items() if status == 'whitelisted' and name not in whitelisted]),
+                ('Could not check', list(unchecked))
+            ]
+            sections = [(title, sorted(names)) for title, names in sections if names]
+            if not sections:
+                message = 'No changes since the last activity report'
+                self.logger.info(message)
+                if from_scheduler:
+                    return None
+                return message
+            self.messages.enqueue(channel, '**' + datetime.utcnow().strftime('%Y-%m-%d %H:%M' + '**'))
+            chunks = []
+            for title, names in sections:
+                chunks += pack_lines(names, '__{}__ ({})\n```'.format(title, len(names)), '```')
+            self.messages.enqueue_many(channel, chunks[:-1])
+            return chunks[-1]
+
+        if not noKillsList and not unchecked:
             message = 'All characters had recent kills'
             self.logger.info(message)
             if from_scheduler:
                 return None
             return message
 
-        with open('config.json', 'w') as f:
-            json.dump(self.config, f, indent=4)
-
         noKillsList.sort()
-        paste_contents = '\n'.join(noKillsList)
-        self.bot.send_message(self.config['PRIVATE_COMMAND_CHANNELS']['ACTIVITY'], '**' + datetime.utcnow().strftime('%Y-%m-%d %H:%M' + '**'))
-
-        n = 1994
-        # split the string
-        paste_list = paste_contents.split('\n')
-        split_entry = ''
-        for entry in paste_list:
-            if len(split_entry + entry) >= n:
-                self.bot.send_message(self.config['PRIVATE_COMMAND_CHANNELS']['ACTIVITY'], '```' + split_entry + '```')
-                split_entry = ''
-            else:
-                split_entry += entry + '\n'
+        self.messages.enqueue(channel, '**' + datetime.utcnow().strftime('%Y-%m-%d %H:%M' + '**'))
 
-        return '```' + split_entry + '```'
+        chunks = pack_lines(noKillsList, '```', '```') if noKillsList else []
+        if unchecked:
+            chunks += pack_lines(sorted(unchecked), '__Could not check__ ({})\n```'.format(len(unchecked)), '```')
+        self.messages.enqueue_many(channel, chunks[:-1])
+        return chunks[-1]
 
-    @classmethod
-    def get_role_id(cls, roles, name):
-        return [e['id'] for e in roles if e['name'] == name][0]
+    def activity_query(self, data):
+        """Answers !activity from the stored sweep history
+
+        Returns:
+            str: message to post in chat
+        """
+        message = data['d']['content']
+        if len(message.split(' ')[1:]) == 0:
+            return 'Please pass a character as an argument!\n `!activity NAME`'
+        character = message.split(' ', 1)[1].strip()
+        if not self.is_main_valid(character):
+            return character + ' is not a valid character!' + self.did_you_mean(character)
+        main = self.get_character_main(character)
+
+        output = 'MAIN: ' + main + '\n'
+        entry = self.activity_whitelist.get(main, self.guild_key(data['d'].get('guild_id')))
+        if entry:
+            if entry.expires is None:
+                output += 'WHITELISTED: permanently (' + entry.description + ')\n'
+            else:
+                output += 'WHITELISTED: ' + str(max(WhitelistStore.days_left(entry), 0)) + ' days left (' + entry.description + ')\n'
+        history = self.history.get(main)
+        if not history:
+            return '```' + output + 'No activity history yet```'
+        output += '\n'
+        for since, until, inactive in history:
+            output += '{} - {}: {}\n'.format(
+                datetime.utcfromtimestamp(since).strftime('%Y-%m-%d'),
+                datetime.utcfromtimestamp(until).strftime('%Y-%m-%d'),
+                'no recent kills' if inactive else 'active'
+            )
+        return '```' + output + '```'
 
     def _handle_subscription(self, data, is_subscribing):
         str_action_direction_now = 'subscribed to' if is_subscribing else 'unsubscribed from'
         str_action_direction_past = 'subscribed to' if is_subscribing else 'unsubscribed from'
         message = data['d']['content']
         args = message.split(' ')[1:]
-        # note: this locks the bot to being for single-server use only (per bot account)
-        guild_id = self.bot.get_connected_guilds()[0]['id']
-        server_roles = self.bot.get_all_guild_roles(guild_id)
-        server_role_names = [r['name'] for r in server_roles]
+        guild_id = data['d'].get('guild_id') or self.guilds.guild_ids()[0]
+        subscribe_roles = self.guild_config(guild_id)['SUBSCRIBE_ROLES']
+        server_roles = self.guilds.role_ids(guild_id)
         member_id = data['d']['author']['id']
-        member_roles = self.bot.get_guild_member_by_id(guild_id, member_id)['roles']
+        member_roles = self.guilds.member_roles(guild_id, member_id)
         if not args:
             # return current groups request
             group_list = []
-            for role_node in self.config['SUBSCRIBE_ROLES']:
-                if role_node['NAME'] in server_role_names:
-                    role_node_id = Util.get_role_id(server_roles, role_node['NAME'])
+            for role_node in subscribe_roles:
+                if role_node['NAME'] in server_roles:
+                    role_node_id = server_roles[role_node['NAME']]
                     if (role_node_id in member_roles) != is_subscribing:
                         group_list.append(role_node['NAME'] + ' (' + role_node['TYPE'] + '): ' + role_node['DESCRIPTION'] + '\n')
             if group_list:
@@ -298,17 +674,17 @@ class Util:
                 return f'```No other groups to {str_action_direction_now}```'
         # role management request
         role_join_name = ' '.join(args).lower()
-        for role_node in self.config['SUBSCRIBE_ROLES']:
+        for role_node in subscribe_roles:
             if role_node['NAME'].lower() == role_join_name:
-                if role_node['NAME'] in server_role_names:
-                    role_node_id = Util.get_role_id(server_roles, role_node['NAME'])
+                if role_node['NAME'] in server_roles:
+                    role_node_id = server_roles[role_node['NAME']]
                     if (role_node_id in member_roles) == is_subscribing:
                         return '<@{}>, you\'re already {} {}'.format(data['d']['author']['id'], str_action_direction_past, role_node['NAME'])
                     else:
                         if is_subscribing:
-                            self.bot.add_member_roles(guild_id, member_id, [role_node_id])
+                            self.guilds.add_member_role(guild_id, member_id, role_node_id)
                         else:
-                            self.bot.remove_member_roles(guild_id, member_id, [role_node_id])
+                            self.guilds.remove_member_role(guild_id, member_id, role_node_id)
                         return '<@{}>, you\'re now {} {}'.format(data['d']['author']['id'], str_action_direction_past, role_node['NAME'])
         return '<@{}>, I can\'t find "{}"'.format(data['d']['author']['id'], role_join_name)
 
@@ -321,19 +697,20 @@ class Util:
     def whitelist(self, data):
         argument_amount = 3
         message = data['d']['content']
+        guild = self.guild_key(data['d'].get('guild_id'))
 
         if len(message.split(' ')[1:]) == 0:
             whitelist = []
             # return the whitelist
-            for j in self.config['ACTIVITY_WHITELIST']:
-                whitelistString = j['NAME'] + ' ('
-                if j['EXPIRY TIME'] < (self.ACTIVITY_TIME_DAYS * -1):
+            for j in self.activity_whitelist.all(guild):
+                whitelistString = j.name + ' ('
+                if j.expires is None:
                     whitelistString += 'PERMANENT): '
-                elif j['EXPIRY TIME'] <= 0:
+                elif WhitelistStore.days_left(j) <= 0:
                     continue
                 else:
-                    whitelistString += str(j['EXPIRY TIME']) + ' days left): '
-                whitelist.append(whitelistString + j['DESCRIPTION'])
+                    whitelistString += str(WhitelistStore.days_left(j)) + ' days left): '
+                whitelist.append(whitelistString + j.description)
             whitelist.sort()
             if whitelist:
                 return '**Whitelist\n**```' + '\n'.join(whitelist) + '```'
@@ -351,10 +728,9 @@ class Util:
 
         main = arg_list[0]
         if not self.is_main_valid(main):
-            return main + ' is not a valid main!'
+            return main + ' is not a valid main!' + self.did_you_mean(main)
 
-        whitelist_lower = [e['NAME'].lower() for e in self.config['ACTIVITY_WHITELIST']]
-        if main.lower() in whitelist_lower:
+        if self.activity_whitelist.get(main, guild):
             return main + ' is already in the whitelist!'
 
         description = arg_list[1]
@@ -366,22 +742,13 @@ class Util:
 
         timeNumber = int(time)
 
-        jsonObject = {
-            'NAME': main,
-            'DESCRIPTION': description,
-            'EXPIRY TIME': timeNumber
-        }
-
         return_string = '**Added entry**\n```Name: ' + main + '\nDescription: ' + description + '\nExpiry time (in days): '
         if timeNumber <= 0:
-            jsonObject['EXPIRY TIME'] = (self.ACTIVITY_TIME_DAYS * -1) - 1
             return_string += 'PERMANENT' + '```'
         else:
             return_string += str(timeNumber) + '```'
 
-        self.config['ACTIVITY_WHITELIST'].append(jsonObject)
-        with open('config.json', 'w') as f:
-            json.dump(self.config, f, indent=4)
+        self.activity_whitelist.add(main, description, timeNumber, guild)
 
         return return_string
 
@@ -391,19 +758,14 @@ class Util:
             return "Please pass a character as an argument!"
 
         args = message.split(' ', 1)[1].lower()
-        activity_whitelist = [e['NAME'].lower() for e in self.config['ACTIVITY_WHITELIST']]
+        entry = self.activity_whitelist.remove(args, self.guild_key(data['d'].get('guild_id')))
 
-        if args not in activity_whitelist:
+        if not entry:
             return "Character " + args + " not found!"
 
-        index = activity_whitelist.index(args.lower())
-        char = self.config['ACTIVITY_WHITELIST'][index]['NAME']
-        self.config['ACTIVITY_WHITELIST'].pop(index)
+        char = entry.name
         self.logger.info(char + ' has been removed from the whitelist!')
 
-        with open('config.json', 'w') as f:
-            json.dump(self.config, f, indent=4)
-
         return char + ' has been removed from the whitelist!'
 
     def query(self, data):
@@ -435,105 +797,143 @@ class Util:
 
         elif queryKind == "char":
             #DO CHAR QUERY
-            data = self.char_query(argList[1])
-            if not data:
-                return "Character not found!"
-
-            output = ""
-
-            #Main
-            main = self.get_character_main(data[0][1])
-            output += "MAIN: " + main + "\n"
-
-            #Alts
-            alts = self.get_database_alts_name(self.get_character_main(data[0][1]))
-            if alts:
-                alts.remove(main)
-            output += "ALTS: " + ", ".join(alts) + "\n"
-
-            #Corp
-            corp = data[0][2]
-            output += "CORP: " + corp + "\n"
-
-            #Reddit
-            reddit = data[0][3]
-            if reddit is not None:
-                output += "REDDIT: " + reddit + "\n"
-
-            #Brotags
-            bro = [["Good fits",data[0][4]],["Scanning",data[0][5]],["Mass & Time",data[0][6]],["Gank",data[0][7]],["PVE",data[0][8]],
-            ["Comms",data[0][9]],["Ships",data[0][10]], ["Intel",data[0][11]],["PVP",data[0][12]],["Doctrine",data[0][13]]]
-
-            if corp == "Wormbro":
-                output += "BRO TAGS:\n"
-                #Checkmarks
-                for index in range(len(bro)):
-                    output += "\t" + bro[index][0] + " ["
-                    if bro[index][1] == 1:
-                        output += "x"
-                    else:
-                        output += " "
-                    output += "]\n"
-
-            #Time in corp
-            charID = data[0][0]
-            if charID is None:
-                self.logger.warning("No character ID found for " + argList[1])
-                return "No character ID found for " + argList[1]
-
-            corpHistoryURL = 'https://esi.tech.ccp.is/latest/characters/' + str(charID) + '/corporationhistory/?datasource=tranquility'
-            corpHistory = requests.get(corpHistoryURL)
-            corpHistoryJSON = corpHistory.json()
-            if corp == "Wormbro":
-                for j in corpHistoryJSON:
-                    if j['corporation_id'] == self.WORMBRO_CORP_ID:
-                        datestr = j['start_date']
-                        date = datetime.strptime(datestr,"%Y-%m-%dT%H:%M:%SZ")
-                        now = datetime.now()
-                        delta = now - date
-                        output += "\nJoined Wormbro on " + str(date) + " (" + str(delta.days) + " days ago)\n"
-                        break
-
-            #Last kill
-            request_url = 'https://zkillboard.com/api/characterID/' + charID + '/limit/1/'
-            self.logger.info('Making killboard request to {}'.format(request_url))
-            r = requests.get(request_url, headers={
-                'Accept-Encoding': 'gzip',
-                'User-Agent': 'Maintainer: ' + self.config['ZKILL_USER_AGENT']
-            })
-            if r.status_code != 200:
-                self.logger.error('Got status code {} from {}'.format(r.status_code, request_url))
-            zkill = r.json()
-            if not zkill:
-                output += "This character has never gotten a kill.\n"
-            else:
-                date = datetime.strptime(zkill[0]['killmail_time'],"%Y-%m-%dT%H:%M:%SZ")
-                now = datetime.now()
-                delta = now - date
-                output +=  "Last kill on " + str(date) + " (" + str(delta.days) + " days ago)\n"
-
-            return "https://zkillboard.com/character/" + charID + "\n```" + output + "```"
+            return self.char_profile(argList[1])
         else:
             return "Argument type not found! Either use Reddit or Char"
 
         #return "TEST"
 
+    def fetch_last_kill(self, charID):
+        """Gets a character's last kill time, from the activity ledger if it is fresh
+
+        Args:
+            charID (str): character id
+
+        Returns:
+            float: unix timestamp of the last kill, or None if there is none
+        """
+        found, last_kill = self.activity.get(charID, ACTIVITY_LEDGER_MAX_AGE)
+        if found:
+            return last_kill
+        request_url = 'https://zkillboard.com/api/characterID/' + charID + '/limit/1/'
+        self.logger.info('Making killboard request to {}'.format(request_url))
+        r = self.http.get(request_url, limiter=self.zkb_limiter, headers={
+            'Accept-Encoding': 'gzip',
+            'User-Agent': 'Maintainer: ' + self.config['ZKILL_USER_AGENT']
+        })
+        if r.status_code != 200:
+            self.logger.error('Got status code {} from {}'.format(r.status_code, request_url))
+        zkill = r.json()
+        last_kill = Util.killmail_timestamp(zkill[0]) if zkill else None
+        if r.status_code == 200:
+            self.activity.record([charID], last_kill)
+        return last_kill
+
+    def char_profile(self, character):
+        """Builds the !query char reply
+
+        Everything from getin-auth comes out of one member index lookup,
+        the corp history and last kill are fetched concurrently, and the
+        finished reply is cached for PROFILE_CACHE_TTL seconds.
+
+        Args:
+            character (str): character name, lowercased
+
+        Returns:
+            str: message to post in chat
+        """
+        with self.profile_lock:
+            cached = self.profile_cache.get(character)
+        if cached and cached[0] > monotonic():
+            return cached[1]
+
+        data = self.char_query(character)
+        if not data:
+            return "Character not found!" + self.did_you_mean(character)
+        charID = data[0][0]
+        if charID is None:
+            self.logger.warning("No character ID found for " + character)
+            return "No character ID found for " + character
+        history_future = self.lookups.submit(self.corp_history.get, charID)
+        kill_future = self.lookups.submit(self.fetch_last_kill, charID)
+
+        output = ""
+
+        #Main
+        main = data[0][14]
+        output += "MAIN: " + main + "\n"
+
+        #Alts
+        entry = self.members.roster().get(main)
+        alts = [e for e in entry.alt_names if e != main] if entry else []
+        output += "ALTS: " + ", ".join(alts) + "\n"
+
+        #Corp
+        corp = data[0][2]
+        output += "CORP: " + corp + "\n"
+
+        #Reddit
+        reddit = data[0][3]
+        if reddit is not None:
+            output += "REDDIT: " + reddit + "\n"
+
+        #Brotags
+        bro = [["Good fits",data[0][4]],["Scanning",data[0][5]],["Mass & Time",data[0][6]],["Gank",data[0][7]],["PVE",data[0][8]],
+        ["Comms",data[0][9]],["Ships",data[0][10]], ["Intel",data[0][11]],["PVP",data[0][12]],["Doctrine",data[0][13]]]
+
+        if corp == "Wormbro":
+            output += "BRO TAGS:\n"
+            #Checkmarks
+            for index in range(len(bro)):
+                output += "\t" + bro[index][0] + " ["
+                if bro[index][1] == 1:
+                    output += "x"
+                else:
+                    output += " "
+                output += "]\n"
+
+        #Time in corp
+        corpHistoryJSON = history_future.result()
+        if corp == "Wormbro":
+            for j in corpHistoryJSON:
+                if j['corporation_id'] == self.WORMBRO_CORP_ID:
+                    datestr = j['start_date']
+                    date = datetime.strptime(datestr,"%Y-%m-%dT%H:%M:%SZ")
+                    now = datetime.now()
+                    delta = now - date
+                    output += "\nJoined Wormbro on " + str(date) + " (" + str(delta.days) + " days ago)\n"
+                    break
+
+        #Last kill
+        last_kill = kill_future.result()
+        if last_kill is None:
+            output += "This character has never gotten a kill.\n"
+        else:
+            date = datetime.utcfromtimestamp(last_kill)
+            now = datetime.now()
+            delta = now - date
+            output +=  "Last kill on " + str(date) + " (" + str(delta.days) + " days ago)\n"
+
+        reply = "https://zkillboard.com/character/" + charID + "\n```" + output + "```"
+        now = monotonic()
+        with self.profile_lock:
+            for key in [k for k, v in self.profile_cache.items() if v[0] <= now]:
+                del self.profile_cache[key]
+            self.profile_cache[character] = (now + PROFILE_CACHE_TTL, reply)
+        return reply
+
     def reddit_query(self, reddit):
         """Get info from the database based on reddit name
 
         Returns:
             list: character names
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute('SELECT character_name FROM member WHERE LOWER(reddit) = LOWER(?) order by character_name asc',(reddit, ))
-        data = cursor.fetchall()
-        connection.close()
+        data = self.members.by_reddit(reddit)
         if len(data) == 0:
             self.logger.error(reddit + " reddit account not found!")
             return []
 
-        return [e[0] for e in data]
+        return sorted(e.character_name for e in data)
 
     def reddit_account_query(self, reddit):
         """Get info from the database based on reddit name
@@ -541,29 +941,19 @@ class Util:
         Returns:
             str: reddit name
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute('SELECT DISTINCT reddit FROM member WHERE LOWER(reddit) = LOWER(?)',(reddit, ))
-        data = cursor.fetchone()
-        connection.close()
+        data = self.members.by_reddit(reddit)
 
-        if data == None:
+        if not data:
             self.logger.error(reddit + " reddit account not found!")
             return "None"
 
-        return data[0]
+        return data[0].reddit
 
     def char_query(self, character):
         """Get info from the database based on character name
 
         Returns:
-            list: character info (character_id, character_name, corporation, reddit, know_good_fits, know_scan, know_mass, know_organize_gank,know_when_to_pve,know_comms,know_appropriate_ships,know_intel,know_pvp,know_doctrine)
+            list: character info (character_id, character_name, corporation, reddit, know_good_fits, know_scan, know_mass, know_organize_gank,know_when_to_pve,know_comms,know_appropriate_ships,know_intel,know_pvp,know_doctrine,main)
         """
-        connection = sqlite3.connect('../getin-auth/data.db')
-        cursor = connection.cursor()
-        cursor.execute(
-        'SELECT character_id,character_name,corporation,reddit,know_good_fits,know_scan,know_mass_and_time,know_organize_gank,know_when_to_pve,know_comms,know_appropriate_ships,know_intel,know_pvp,know_doctrine'
-        ' FROM member WHERE LOWER(character_name) = LOWER(?) order by character_name asc',(character, ))
-        data = cursor.fetchall()
-        connection.close()
-        return data
+        data = sorted(self.members.by_name(character), key=lambda e: e.character_name)
+        return [e[:14] + (e.main, ) for e in data]
@@ -0,0 +1,164 @@
+from collections import namedtuple
+from math import ceil
+from threading import Lock
+from time import time
+import sqlite3
+
+
+WhitelistEntry = namedtuple('WhitelistEntry', ['name', 'description', 'expires'])
+
+
+class WhitelistStore:
+
+    def __init__(self, path, grace):
+        """Activity whitelist, indexed by guild and casefolded name
+
+        Entries hold an absolute expiry timestamp (``None`` for permanent).
+        An entry keeps exempting its main for ``grace`` seconds after it
+        expires, so whitelisted members get a full activity window to make a
+        kill. Expired entries are dropped lazily when they are next looked at.
+        Every method takes an optional guild key; ``''`` is the default guild.
+
+        Args:
+            path (str): path to the local sqlite file
+            grace (int): seconds an expired entry still applies for
+        """
+        self.grace = grace
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(whitelist)')]
+        if columns and 'guild' not in columns:
+            # tables from before multi-guild support are keyed by name alone
+            self.connection.execute('ALTER TABLE whitelist RENAME TO whitelist_old')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS whitelist (guild TEXT NOT NULL, key TEXT NOT NULL, name TEXT NOT NULL, '
+            'description TEXT NOT NULL, expires REAL, PRIMARY KEY (guild, key))'
+        )
+        if columns and 'guild' not in columns:
+            self.connection.execute(
+                "INSERT INTO whitelist (guild, key, name, description, expires) SELECT '', key, name, description, expires FROM whitelist_old"
+            )
+            self.connection.execute('DROP TABLE whitelist_old')
+        self.connection.commit()
+        self.entries = {
+            (row[0], row[1]): WhitelistEntry(*row[2:])
+            for row in self.connection.execute('SELECT guild, key, name, description, expires FROM whitelist')
+        }
+
+    def _expired(self, entry, now):
+        return entry.expires is not None and entry.expires + self.grace <= now
+
+    def _delete(self, key):
+        del self.entries[key]
+        self.connection.execute('DELETE FROM whitelist WHERE guild = ? AND key = ?', key)
+        self.connection.commit()
+
+    def _put(self, entry, guild=''):
+        with self.lock:
+            self.entries[(guild, entry.name.casefold())] = entry
+            self.connection.execute(
+                'INSERT OR REPLACE INTO whitelist (guild, key, name, description, expires) VALUES (?, ?, ?, ?, ?)',
+                (guild, entry.name.casefold()) + entry
+            )
+            self.connection.commit()
+        return entry
+
+    def get(self, name, guild=''):
+        """Gets a main's whitelist entry
+
+        Args:
+            name (str): main character name
+            guild (str): guild key
+
+        Returns:
+            WhitelistEntry: the entry, or None if the main is not whitelisted
+        """
+        key = (guild, name.casefold())
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and self._expired(entry, time()):
+                self._delete(key)
+                return None
+            return entry
+
+    def add(self, name, description, days, guild=''):
+        """Adds a main to the whitelist
+
+        Args:
+            name (str): main character name
+            description (str): reason for the entry
+            days (int): days until expiry; zero or less is permanent
+            guild (str): guild key
+
+        Returns:
+            WhitelistEntry: the new entry
+        """
+        return self._put(WhitelistEntry(name, description, time() + days * 86400 if days > 0 else None), guild)
+
+    def remove(self, name, guild=''):
+        """Removes a main from the whitelist
+
+        Args:
+            name (str): main character name
+            guild (str): guild key
+
+        Returns:
+            WhitelistEntry: the removed entry, or None if it wasn't whitelisted
+        """
+        key = (guild, name.casefold())
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self._delete(key)
+            return entry
+
+    def all(self, guild=''):
+        """Gets every entry that still applies
+
+        Args:
+            guild (str): guild key
+
+        Returns:
+            list: WhitelistEntry records
+        """
+        now = time()
+        with self.lock:
+            for key in [k for k, v in self.entries.items() if self._expired(v, now)]:
+                self._delete(key)
+            return [v for k, v in self.entries.items() if k[0] == guild]
+
+    @staticmethod
+    def days_left(entry):
+        """Gets the number of whole days before an entry expires
+
+        Args:
+            entry (WhitelistEntry): entry
+
+        Returns:
+            int: days left, zero or less once expired
+        """
+        return ceil((entry.expires - time()) / 86400)
+
+    def migrate(self, legacy, activity_time_days):
+        """Imports entries from the old ``ACTIVITY_WHITELIST`` config list
+
+        The old format counted ``EXPIRY TIME`` down by one per sweep and
+        treated anything below ``-activity_time_days`` as permanent.
+
+        Args:
+            legacy (list): entries from config.json
+            activity_time_days (int): activity window in days
+
+        Returns:
+            int: number of entries imported
+        """
+        imported = 0
+        for e in legacy:
+            if self.get(e['NAME']):
+                continue
+            expires = None
+            if e['EXPIRY TIME'] >= activity_time_days * -1:
+                expires = time() + e['EXPIRY TIME'] * 86400
+            self._put(WhitelistEntry(e['NAME'], e['DESCRIPTION'], expires))
+            imported += 1
+        return imported